@@ -3,9 +3,9 @@ import sys
 
 import psutil
 
-from github_menubar import BitBarRenderer
 from github_menubar.config import CONFIG, DEFAULT_CONFIG, GLYPHS
-from github_menubar.github_client import load_config
+from github_menubar.snapshot import read_snapshot, write_snapshot
+from github_menubar.utils import load_config
 
 
 def startProcess():
@@ -43,8 +43,14 @@ def main(argv):
             with open(CONFIG["pid_file"], "r") as fi:
                 pid = int(fi.read().strip())
             if psutil.pid_exists(pid):
-                renderer = BitBarRenderer()
-                renderer.print_state()
+                snapshot = read_snapshot(config["snapshot_max_age"])
+                if snapshot is None:
+                    # only import the renderer (and the client) when rendering
+                    from github_menubar import BitBarRenderer
+
+                    snapshot = BitBarRenderer().render()
+                    write_snapshot(snapshot)
+                sys.stdout.write(snapshot)
             else:
                 startProcess()
         else:
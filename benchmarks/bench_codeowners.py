@@ -0,0 +1,79 @@
+"""Micro-benchmark: CODEOWNERS matching
+
+Compares the compiled `CodeOwners` matcher with the substring loop it replaced, on a
+synthetic monorepo CODEOWNERS file. Run from the repo root:
+
+    python benchmarks/bench_codeowners.py [--rules 900] [--files 3000]
+"""
+import argparse
+import random
+import time
+
+from github_menubar.codeowners import CodeOwners
+
+
+def legacy_owners(codeowner_info, filename):
+    """The matching loop `get_pr_codeowners` used before `CodeOwners`"""
+    file_owners = None
+    for path, owners in codeowner_info:
+        if path == "*":
+            file_owners = owners
+        if path in f"/{filename}":
+            file_owners = owners
+    return file_owners
+
+
+def synthetic_repo(n_rules, n_files, seed=0):
+    rng = random.Random(seed)
+    services = [f"service{i}" for i in range(n_rules // 3)]
+    lines = ["* @org/everyone"]
+    for i in range(n_rules - 1):
+        service = rng.choice(services)
+        kind = i % 3
+        if kind == 0:
+            lines.append(f"/{service}/ @org/team{i % 50}")
+        elif kind == 1:
+            lines.append(f"/{service}/src/*.py @org/team{i % 50} @user{i}")
+        else:
+            lines.append(f"**/{service}/docs/ @user{i}")
+    files = [
+        f"{rng.choice(services)}/{rng.choice(['src', 'docs', 'tests'])}/"
+        f"{'/'.join(f'd{rng.randrange(5)}' for _ in range(rng.randrange(3)))}"
+        f"file{i}.{rng.choice(['py', 'md', 'txt'])}".replace("//", "/")
+        for i in range(n_files)
+    ]
+    return "\n".join(lines), files
+
+
+def timed(func, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rules", type=int, default=900)
+    parser.add_argument("--files", type=int, default=3000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    contents, files = synthetic_repo(args.rules, args.files)
+    matcher = CodeOwners.parse(contents)
+    rules = list(matcher)
+
+    compile_time = timed(lambda: CodeOwners(rules).owners(""), args.repeat)
+    legacy = timed(lambda: [legacy_owners(rules, f) for f in files], args.repeat)
+    compiled = timed(lambda: [matcher.owners(f) for f in files], args.repeat)
+
+    print(f"{len(rules)} rules, {len(files)} files (best of {args.repeat})")
+    print(f"  substring loop:    {legacy * 1000:8.1f} ms")
+    print(f"  compiled matcher:  {compiled * 1000:8.1f} ms  ({legacy / compiled:.0f}x)")
+    print(f"  compile (once per repo): {compile_time * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""Benchmark: latency of `gmb` commands
+
+Starts a ZEO server on a temporary database filled with synthetic PRs, and a
+`GitHubClient` serving commands on a control socket, as `run_server` does. It then
+times muting a PR three ways:
+
+ - sending the command over the socket from this process, i.e. the channel alone
+ - running the `gmb` CLI, which sends the command to the server
+ - running a process that creates its own `GitHubClient` and mutes the PR, as `gmb`
+   did before it talked to the server
+
+Run from the repo root:
+
+    python benchmarks/bench_control.py [--prs 1000] [--runs 10]
+"""
+import argparse
+import logging
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+# point the config and database at a scratch directory before github_menubar is imported
+os.environ["HOME"] = tempfile.mkdtemp()
+os.makedirs(os.path.join(os.environ["HOME"], ".github_menubar"))
+
+from bench_state_client import free_port, populate  # noqa: E402
+
+from github_menubar import control  # noqa: E402
+from github_menubar.config import CONFIG, DEFAULT_CONFIG  # noqa: E402
+from github_menubar.github_client import GitHubClient  # noqa: E402
+
+CLI = "import sys; from github_menubar.cli import main; sys.argv[0] = 'gmb'; main()"
+STANDALONE = (
+    "import sys; from github_menubar.github_client import GitHubClient; "
+    "GitHubClient().mute_pr(int(sys.argv[1]))"
+)
+
+
+def timed(func, runs):
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return statistics.median(times)
+
+
+def run_command(code, *args):
+    subprocess.run(
+        [sys.executable, "-c", code, *args], check=True, stderr=subprocess.DEVNULL
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--prs", type=int, default=1000)
+    parser.add_argument("--runs", type=int, default=10)
+    args = parser.parse_args()
+
+    port = free_port()
+    with open(CONFIG["config_file_path"], "w") as fo:
+        fo.write(
+            DEFAULT_CONFIG.replace("user: null", "user: dev0")
+            .replace("token: null", "token: benchmark")
+            .replace("port: 9999", f"port: {port}")
+        )
+    server = subprocess.Popen(
+        [sys.executable, "-m", "ZEO.runzeo", "-a", str(port), "-f", CONFIG["db_location"]],
+        stderr=subprocess.DEVNULL,
+    )
+    # without a running server to render for, rendering the snapshot after each
+    # mute fails and logs an error; it fails the same way on every path
+    logging.disable(logging.ERROR)
+    try:
+        populate(port, args.prs, 0)
+        client = GitHubClient()
+        commands = control.ControlServer({"mute": client.mute_pr})
+        commands.start()
+        results = (
+            ("control socket", lambda: control.send("mute", 1)),
+            ("gmb via the server", lambda: run_command(CLI, "mute", "1")),
+            ("standalone GitHubClient", lambda: run_command(STANDALONE, "1")),
+        )
+        print(f"Muting a PR, {args.prs} PRs (median of {args.runs})")
+        for name, func in results:
+            print(f"  {name:<26}{timed(func, args.runs) * 1000:8.1f} ms")
+        commands.stop()
+    finally:
+        server.terminate()
+
+
+if __name__ == "__main__":
+    main()
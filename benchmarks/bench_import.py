@@ -0,0 +1,89 @@
+"""Import-time budget check
+
+Runs each entry point in a fresh interpreter with `python -X importtime`, adds up the
+cumulative time of its top-level imports (leaving out what the interpreter imports at
+startup), and checks it against a budget. It also fails if an entry point imports
+any module it shouldn't need, which is the usual way the plugin path regresses. Run
+from the repo root:
+
+    python benchmarks/bench_import.py [--runs 5] [--scale 1.0]
+
+Exits with status 1 if any entry point is over budget or imports a forbidden module.
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# modules only the server, or a live render, should pay for
+HEAVY = ("github3", "ZODB", "ZEO", "apscheduler", "pync", "tabulate", "arrow", "requests")
+
+ENTRY_POINTS = {
+    # the plugin script itself, without running its main
+    "plugin": ("import base_plugin_script\n", 50, HEAVY),
+    "package": ("import github_menubar\n", 10, HEAVY),
+    "live render": ("from github_menubar import BitBarRenderer\n", 400, ("apscheduler",)),
+}
+
+
+def import_times(code):
+    """{top-level module: cumulative microseconds} for running `code` in the repo root"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        capture_output=True,
+        text=True,
+        check=True,
+        cwd=REPO_ROOT,
+    )
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:") :].split("|")
+        # nested imports are indented below the top-level import that triggered them
+        times[name[1:].rstrip()] = int(cumulative)
+    return times
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument(
+        "--scale", type=float, default=1.0, help="multiply all budgets, for slow machines"
+    )
+    args = parser.parse_args()
+
+    startup = {name for name in import_times("pass") if not name.startswith(" ")}
+    failed = False
+    for entry_point, (code, budget, forbidden) in ENTRY_POINTS.items():
+        budget *= args.scale
+        totals = []
+        for _ in range(args.runs):
+            times = import_times(code)
+            top_level = {
+                name: us
+                for name, us in times.items()
+                if not name.startswith(" ") and name not in startup
+            }
+            totals.append(sum(top_level.values()) / 1000)
+        imported = {name.strip().split(".")[0] for name in times}
+        bad = sorted(set(forbidden) & imported)
+        total = statistics.median(totals)
+        slowest = sorted(top_level.items(), key=lambda item: -item[1])[:3]
+        status = "OK" if total <= budget and not bad else "FAIL"
+        failed |= status == "FAIL"
+        print(f"{status:4} {entry_point:<12} {total:7.1f} ms (budget {budget:.0f} ms)")
+        print(
+            "       slowest: "
+            + ", ".join(f"{name} {us / 1000:.1f} ms" for name, us in slowest)
+        )
+        if bad:
+            print(f"       imports {', '.join(bad)}")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
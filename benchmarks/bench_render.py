@@ -0,0 +1,133 @@
+"""Benchmark: rendering the BitBar menu for states of increasing size
+
+For each size, renders that many synthetic PRs and notifications, every
+notification referring to one of the PRs, with `BitBarRenderer`. Reports the time
+taken to build the renderer (which indexes the state), to render the menu to a
+string, and to write it to /dev/null with `print_state`, plus the peak memory
+allocated during a render, as traced by `tracemalloc`. Run from the repo root:
+
+    python benchmarks/bench_render.py [--sizes 100,1000,5000]
+"""
+import argparse
+import contextlib
+import os
+import statistics
+import tempfile
+import time
+import tracemalloc
+
+# point the config at a scratch directory before github_menubar is imported
+os.environ["HOME"] = tempfile.mkdtemp()
+os.makedirs(os.path.join(os.environ["HOME"], ".github_menubar"))
+
+import arrow  # noqa: E402
+from bench_storage import synthetic_state  # noqa: E402
+
+from github_menubar.config import CONFIG, DEFAULT_CONFIG  # noqa: E402
+from github_menubar.renderers import BitBarRenderer  # noqa: E402
+
+USER = "dev0"
+
+
+class StaticClient:
+    """Stands in for `StateClient`, serving a fixed state"""
+
+    def __init__(self, state):
+        self.state = state
+
+    def get_state(self):
+        return self.state
+
+
+def render_state(n_prs, n_notifications):
+    pull_requests, notifications = synthetic_state(n_prs, n_notifications)
+    for notification in notifications.values():
+        notification["url"] = pull_requests[notification["pr_id"]]["url"]
+    return {
+        "notifications": notifications,
+        "pull_requests": pull_requests,
+        "codeowners": {},
+        "team_members": {},
+        "last_update": arrow.get(1600000000),
+        "schedule": None,
+        "mentioned": set(),
+        "team_mentioned": set(),
+        "muted_prs": [],
+    }
+
+
+def write_config():
+    with open(CONFIG["config_file_path"], "w") as fo:
+        fo.write(DEFAULT_CONFIG.replace("user: null", f"user: {USER}"))
+
+
+@contextlib.contextmanager
+def pid_file():
+    """A PID file for the renderer to show, unless a running server's is there"""
+    own_pid_file = not os.path.exists(CONFIG["pid_file"])
+    if own_pid_file:
+        with open(CONFIG["pid_file"], "w") as fo:
+            fo.write("0")
+    try:
+        yield
+    finally:
+        if own_pid_file:
+            os.remove(CONFIG["pid_file"])
+
+
+def timed(func, runs):
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        result = func()
+        times.append(time.perf_counter() - start)
+    return statistics.median(times), result
+
+
+def peak_allocated(func):
+    """Peak memory, in bytes, allocated while `func` runs"""
+    tracemalloc.start()
+    try:
+        func()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--sizes",
+        default="100,1000,5000",
+        help="comma-separated numbers of PRs (and of notifications) to render",
+    )
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--output", help="also write the largest menu to this file")
+    args = parser.parse_args()
+    sizes = [int(size) for size in args.sizes.split(",")]
+
+    write_config()
+    print(f"median of {args.runs} runs")
+    print(
+        f"{'size':>6}{'lines':>9}{'build ms':>10}{'render ms':>11}"
+        f"{'write ms':>10}{'peak KiB':>10}"
+    )
+    with pid_file():
+        for size in sizes:
+            client = StaticClient(render_state(size, size))
+            build, renderer = timed(lambda: BitBarRenderer(client=client), args.runs)
+            render, output = timed(renderer.render, args.runs)
+            with open(os.devnull, "w") as devnull:
+                write, _ = timed(lambda: renderer.print_state(devnull), args.runs)
+            peak = peak_allocated(renderer.render)
+            print(
+                f"{size:>6}{len(output.splitlines()):>9}{build * 1000:>10.1f}"
+                f"{render * 1000:>11.1f}{write * 1000:>10.1f}{peak / 1024:>10.0f}"
+            )
+    if args.output:
+        with open(args.output, "w") as fo:
+            fo.write(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""Benchmark: reading state with StateClient vs GitHubClient
+
+Starts a ZEO server on a temporary database filled with synthetic PRs and
+notifications. It then times what a renderer does, creating a client and reading
+the state, with the full `GitHubClient` and with the read-only `StateClient`. Every
+run uses a new client, as the BitBar plugin does; `StateClient` is timed both with
+its persistent cache removed before each run and with the cache left from the
+previous run. Run from the repo root:
+
+    python benchmarks/bench_state_client.py [--prs 1000] [--notifications 1000]
+"""
+import argparse
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+# point the config and database at a scratch directory before github_menubar is imported
+os.environ["HOME"] = tempfile.mkdtemp()
+os.makedirs(os.path.join(os.environ["HOME"], ".github_menubar"))
+
+from bench_storage import synthetic_state  # noqa: E402
+from ZEO.ClientStorage import ClientStorage  # noqa: E402
+from ZODB import DB  # noqa: E402
+
+from github_menubar import state  # noqa: E402
+from github_menubar.config import CONFIG, DEFAULT_CONFIG  # noqa: E402
+from github_menubar.github_client import GitHubClient  # noqa: E402
+from github_menubar.storage import init_root  # noqa: E402
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def populate(port, n_prs, n_notifications):
+    pull_requests, notifications = synthetic_state(n_prs, n_notifications)
+    db = DB(ClientStorage(port, wait_timeout=30))
+    with db.transaction() as conn:
+        conn.root.pull_requests = pull_requests
+        conn.root.notifications = notifications
+        init_root(conn.root)
+    db.close()
+
+
+def drop_reader_cache():
+    for name in os.listdir(CONFIG["base_dir"]):
+        if name.startswith(f"{state.CACHE_NAME}-"):
+            os.remove(os.path.join(CONFIG["base_dir"], name))
+
+
+def timed(make_client, runs, setup):
+    construct, read = [], []
+    for _ in range(runs):
+        setup()
+        start = time.perf_counter()
+        client = make_client()
+        construct.append(time.perf_counter() - start)
+        start = time.perf_counter()
+        client.get_state()
+        read.append(time.perf_counter() - start)
+        client.db.close()
+    return statistics.median(construct), statistics.median(read)
+
+
+def run(args):
+    print(f"{args.prs} PRs, {args.notifications} notifications (median of {args.runs})")
+    print(f"  {'client':<30}{'create':>10}{'read state':>12}")
+    for name, make_client, setup in (
+        ("GitHubClient", GitHubClient, lambda: None),
+        ("StateClient, cold cache", state.StateClient, drop_reader_cache),
+        ("StateClient, warm cache", state.StateClient, lambda: None),
+    ):
+        construct, read = timed(make_client, args.runs, setup)
+        print(f"  {name:<30}{construct * 1000:8.1f} ms{read * 1000:10.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--prs", type=int, default=1000)
+    parser.add_argument("--notifications", type=int, default=1000)
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    port = free_port()
+    with open(CONFIG["config_file_path"], "w") as fo:
+        fo.write(
+            DEFAULT_CONFIG.replace("user: null", "user: dev0")
+            .replace("token: null", "token: benchmark")
+            .replace("port: 9999", f"port: {port}")
+        )
+    # a separate process, like the GMB server, so it doesn't compete for the GIL
+    server = subprocess.Popen(
+        [sys.executable, "-m", "ZEO.runzeo", "-a", str(port), "-f", CONFIG["db_location"]],
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        populate(port, args.prs, args.notifications)
+        run(args)
+    finally:
+        server.terminate()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,175 @@
+"""Benchmark: bytes written to the database per operation
+
+Builds a database with synthetic PRs and notifications in the plain-dict layout
+earlier versions stored on the root, times migrating a copy of it to the current
+layout (see `github_menubar.storage`), then compares how much each common operation
+appends to the FileStorage in each layout. Run from the repo root:
+
+    python benchmarks/bench_storage.py [--prs 1000] [--notifications 1000]
+"""
+import argparse
+import os
+import shutil
+import tempfile
+import time
+
+import arrow
+from ZODB import DB
+from ZODB.FileStorage import FileStorage
+
+from github_menubar.storage import init_root, UnitOfWork
+
+
+def synthetic_state(n_prs, n_notifications):
+    pull_requests = {}
+    for i in range(n_prs):
+        pull_requests[i] = {
+            "id": i,
+            "number": i,
+            "title": f"Pull request {i}",
+            "description": f"org/repo{i % 20} {i}: Pull request {i}",
+            "url": f"https://api.github.com/repos/org/repo{i % 20}/pulls/{i}",
+            "browser_url": f"https://github.com/org/repo{i % 20}/pull/{i}",
+            "author": f"dev{i % 30}",
+            "base": "master",
+            "head": f"feature-{i}",
+            "org": "org",
+            "repo": f"repo{i % 20}",
+            "state": "OPEN",
+            "mergeable": True,
+            "mergeable_state": "clean",
+            "protected": True,
+            "muted": False,
+            "updated_at": arrow.get(1600000000 + i),
+            "reviews": {f"dev{j}": {"state": "APPROVED"} for j in range(i % 4)},
+            "owners": {f"org/team-{j}": bool(j % 2) for j in range(i % 3)},
+            "test_status": {
+                "outcome": "success",
+                "runs": {f"check-{j}": ("success", j == 0) for j in range(5)},
+            },
+        }
+    notifications = {
+        i: {
+            "title": f"Pull request {i % max(n_prs, 1)}",
+            "type": "PullRequest",
+            "url": f"https://api.github.com/repos/org/repo0/pulls/{i}",
+            "reason": "review_requested",
+            "updated_at": arrow.get(1600000000 + i),
+            "cleared": False,
+            "pr_id": i % max(n_prs, 1),
+            "pr_url": f"https://github.com/org/repo0/pull/{i}",
+        }
+        for i in range(n_notifications)
+    }
+    return pull_requests, notifications
+
+
+def create_legacy(path, pull_requests, notifications):
+    db = DB(FileStorage(path))
+    with db.transaction() as conn:
+        conn.root.pull_requests = pull_requests
+        conn.root.notifications = notifications
+        conn.root.codeowners = {}
+        conn.root.team_members = {}
+        conn.root.mentioned = set(list(pull_requests)[::3])
+        conn.root.team_mentioned = set()
+        conn.root.last_update = None
+    return db
+
+
+def written(db, func):
+    """Bytes appended to `db`'s FileStorage by `func`"""
+    path = db.storage.getName()
+    before = os.path.getsize(path)
+    func()
+    return os.path.getsize(path) - before
+
+
+def legacy_mute(db):
+    with db.transaction() as conn:
+        pull_requests = conn.root.pull_requests
+        pull_requests[0]["muted"] = True
+        conn.root.pull_requests = pull_requests
+
+
+def legacy_clear(db):
+    with db.transaction() as conn:
+        notifications = conn.root.notifications
+        notifications[0]["cleared"] = True
+        conn.root.notifications = notifications
+
+
+def legacy_update(db, changed):
+    with db.transaction() as conn:
+        pull_requests = dict(conn.root.pull_requests)
+        for id_ in changed:
+            pull_requests[id_] = dict(pull_requests[id_], title="Changed")
+        conn.root.pull_requests = pull_requests
+        conn.root.last_update = arrow.now()
+
+
+def mute(db):
+    with db.transaction() as conn:
+        conn.root.pull_requests[0]["muted"] = True
+
+
+def clear(db):
+    with db.transaction() as conn:
+        conn.root.notifications[0]["cleared"] = True
+
+
+def update(db, changed):
+    uow = UnitOfWork(db)
+    # an update stores every PR it sees; only the changed ones should be written
+    for id_, pr in list(uow["pull_requests"].items()):
+        uow.put("pull_requests", id_, dict(pr, title="Changed") if id_ in changed else pr)
+    uow.set("last_update", arrow.now())
+    uow.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--prs", type=int, default=1000)
+    parser.add_argument("--notifications", type=int, default=1000)
+    parser.add_argument("--changed", type=float, default=0.05)
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp()
+    try:
+        pull_requests, notifications = synthetic_state(args.prs, args.notifications)
+        create_legacy(os.path.join(tmp, "legacy.fs"), pull_requests, notifications).close()
+        shutil.copy(os.path.join(tmp, "legacy.fs"), os.path.join(tmp, "current.fs"))
+        legacy = DB(FileStorage(os.path.join(tmp, "legacy.fs")))
+        current = DB(FileStorage(os.path.join(tmp, "current.fs")))
+        start = time.perf_counter()
+        with current.transaction() as conn:
+            init_root(conn.root)
+        migration = time.perf_counter() - start
+        changed = set()
+        if args.changed:
+            changed = set(range(0, args.prs, max(1, round(1 / args.changed))))
+
+        print(f"{args.prs} PRs, {args.notifications} notifications")
+        print(f"  migration: {migration * 1000:.0f} ms")
+        print(f"  {'operation':<28}{'plain dicts':>14}{'BTrees':>14}")
+        operations = (
+            ("mute a PR", legacy_mute, mute),
+            ("clear a notification", legacy_clear, clear),
+            (
+                f"update, {len(changed)} PRs changed",
+                lambda db: legacy_update(db, changed),
+                lambda db: update(db, changed),
+            ),
+        )
+        for name, old, new in operations:
+            before = written(legacy, lambda: old(legacy))
+            after = written(current, lambda: new(current))
+            print(f"  {name:<28}{before:>12} B{after:>12} B")
+        legacy.close()
+        current.close()
+    finally:
+        shutil.rmtree(tmp)
+
+
+if __name__ == "__main__":
+    main()
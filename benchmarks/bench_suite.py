@@ -0,0 +1,220 @@
+"""Benchmark suite: an update cycle against a local fake GitHub
+
+Serves `fake_github.FakeGitHub`, seeded at the given scale, from a separate
+process, and points a `GitHubClient` on a new database at it. Then measures, in
+order:
+
+ - update_new_database: the first `update()`, which fetches everything
+ - update_unchanged: a second `update()`, with nothing changed on GitHub
+ - update_after_activity: an `update()` after `--touched` of the PRs involving the
+   user were updated
+ - get_state: `GitHubClient.get_state()`
+ - print_state: `BitBarRenderer().print_state()`, reading the state with a
+   `StateClient` as the BitBar plugin does, written to /dev/null
+
+For each, reports the wall time, the API requests served by endpoint, the
+transactions committed to the database and the peak memory allocated, as traced by
+`tracemalloc`. Tracing slows everything down, so the cycle is run twice, each time
+on a new fake and database: once for the times, requests and commits, and once for
+the memory. Results are written as JSON, to compare between revisions. Run from the
+repo root:
+
+    python benchmarks/bench_suite.py [--prs 200] [--latency 0.01] [--output out.json]
+"""
+import argparse
+import datetime
+import json
+import logging
+import multiprocessing
+import os
+import platform
+import time
+import tracemalloc
+
+from bench_render import pid_file
+from bench_state_client import drop_reader_cache
+from check_pipeline import Scenario
+from fake_github import EPOCH, FakeGitHub
+from ZODB.utils import p64, u64
+
+from github_menubar.renderers import BitBarRenderer
+
+PHASES = (
+    "update_new_database",
+    "update_unchanged",
+    "update_after_activity",
+    "get_state",
+    "print_state",
+)
+
+
+def serve(conn, options):
+    """Serve a `FakeGitHub` and answer commands from the benchmark over `conn`"""
+    fake = FakeGitHub(**options).start()
+    conn.send((fake.url, fake.user))
+    while True:
+        command, arg = conn.recv()
+        if command == "requests":
+            with fake.lock:
+                conn.send(dict(fake.requests))
+        elif command == "reset":
+            fake.reset_counts()
+            conn.send(None)
+        elif command == "touch":
+            now = datetime.datetime.now(datetime.timezone.utc)
+            minutes = (now - EPOCH).total_seconds() // 60 + 1
+            for pull_request in fake.search(f"is:open involves:{fake.user}")[:arg]:
+                fake.touch(pull_request, minutes)
+            conn.send(None)
+        elif command == "stop":
+            fake.stop()
+            conn.send(None)
+            return
+
+
+class RemoteFake:
+    """A `FakeGitHub` in its own process, so it isn't timed or traced with GMB"""
+
+    def __init__(self, options):
+        self._conn, child = multiprocessing.Pipe()
+        context = multiprocessing.get_context("spawn")
+        self._process = context.Process(target=serve, args=(child, options))
+        self._process.start()
+        self.url, self.user = self._conn.recv()
+
+    def call(self, command, arg=None):
+        self._conn.send((command, arg))
+        return self._conn.recv()
+
+    def stop(self):
+        self.call("stop")
+        self._process.join()
+
+
+class Commits:
+    """Counts the transactions committed to a database since the last count"""
+
+    def __init__(self, storage):
+        self.storage = storage
+        self.last = storage.lastTransaction()
+
+    def count(self):
+        self.storage.sync()
+        start = p64(u64(self.last) + 1)
+        self.last = self.storage.lastTransaction()
+        return sum(1 for _ in self.storage.iterator(start=start))
+
+
+def run_cycle(options, config, touched, trace):
+    """Run the measured phases on a new fake and database"""
+    fake = RemoteFake(options)
+    # the renderer's cache from the previous cycle is of another database
+    drop_reader_cache()
+    scenario = Scenario(fake, **config)
+    commits = Commits(scenario.client.storage)
+    results = {}
+
+    def measure(name, func):
+        fake.call("reset")
+        if trace:
+            tracemalloc.start()
+        start = time.perf_counter()
+        try:
+            func()
+        finally:
+            wall = time.perf_counter() - start
+            if trace:
+                peak = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+        if trace:
+            results[name] = {"peak_memory_bytes": peak}
+            return
+        requests = dict(sorted(fake.call("requests").items()))
+        results[name] = {
+            "wall_s": round(wall, 4),
+            "requests": requests,
+            "total_requests": sum(requests.values()),
+            "db_commits": commits.count(),
+        }
+
+    def print_state():
+        with open(os.devnull, "w") as devnull:
+            BitBarRenderer().print_state(devnull)
+
+    try:
+        with pid_file():
+            measure("update_new_database", scenario.client.update)
+            measure("update_unchanged", scenario.client.update)
+            fake.call("touch", touched)
+            measure("update_after_activity", scenario.client.update)
+            measure("get_state", scenario.client.get_state)
+            measure("print_state", print_state)
+    finally:
+        scenario.close()
+        fake.stop()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--orgs", type=int, default=2)
+    parser.add_argument("--repos-per-org", type=int, default=3)
+    parser.add_argument("--prs", type=int, default=200)
+    parser.add_argument("--files-per-pr", type=int, default=5)
+    parser.add_argument("--reviews-per-pr", type=int, default=2)
+    parser.add_argument("--check-runs", type=int, default=3)
+    parser.add_argument("--codeowners-rules", type=int, default=20)
+    parser.add_argument("--teams-per-org", type=int, default=3)
+    parser.add_argument("--members-per-team", type=int, default=5)
+    parser.add_argument("--notifications", type=int, default=50)
+    parser.add_argument("--latency", type=float, default=0.01, help="seconds per request")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--enrichment-workers", type=int, default=8)
+    parser.add_argument(
+        "--touched",
+        type=int,
+        default=10,
+        help="PRs involving the user updated before the third update",
+    )
+    parser.add_argument("--output", help="write the results to this file too")
+    args = parser.parse_args()
+
+    options = dict(
+        orgs=args.orgs,
+        repos_per_org=args.repos_per_org,
+        pull_requests=args.prs,
+        files_per_pr=args.files_per_pr,
+        reviews_per_pr=args.reviews_per_pr,
+        check_runs=args.check_runs,
+        codeowners_rules=args.codeowners_rules,
+        teams_per_org=args.teams_per_org,
+        members_per_team=args.members_per_team,
+        notifications=args.notifications,
+        latency=args.latency,
+        seed=args.seed,
+    )
+    # without the client's own throttle, which would otherwise time the later
+    # updates once the first has used up the bucket
+    config = dict(enrichment_workers=args.enrichment_workers, requests_per_minute=0)
+
+    # keep the update's logging out of the results
+    logging.disable(logging.ERROR)
+    phases = run_cycle(options, config, args.touched, trace=False)
+    memory = run_cycle(options, config, args.touched, trace=True)
+    for name in PHASES:
+        phases[name].update(memory[name])
+    results = {
+        "python": platform.python_version(),
+        "fake_github": options,
+        "config": dict(config, touched=args.touched),
+        "phases": phases,
+    }
+    text = json.dumps(results, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w") as fo:
+            fo.write(text + "\n")
+
+
+if __name__ == "__main__":
+    main()
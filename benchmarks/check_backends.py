@@ -0,0 +1,87 @@
+"""Check: `RestBackend` and `GraphQLBackend` give the same PR records
+
+Fetches every PR of a local `fake_github.FakeGitHub` through each backend and
+parses them with `GitHubClient.parse_pull_request`, as an update stores them, then
+checks that both backends give the same records. One update runs first, so the
+client knows the user's teams and code owners are matched against them; each
+backend then fetches the CODEOWNERS files and branch protection itself. Also
+prints the requests each backend made. Run from the repo root:
+
+    python benchmarks/check_backends.py [--prs 50]
+"""
+import argparse
+import logging
+import sys
+
+from check_pipeline import canonical, check, Scenario
+from fake_github import FakeGitHub
+
+from github_menubar.backends import GraphQLBackend, graphql_url, RestBackend
+from github_menubar.caches import TTLCache
+from github_menubar.storage import UnitOfWork
+
+
+def parse_all(client, backend, refs):
+    """The records of the PRs at `refs`, fetched through `backend`"""
+    client._backend = backend
+    client._fetched = {}
+    client._key_locks = {}
+    client.protection = TTLCache(client.CONFIG["protection_ttl"])
+    client._uow = UnitOfWork(client.db)
+    # so the backend fetches the CODEOWNERS files
+    client._uow["codeowners"].clear()
+    records = {}
+    for pull_request in backend.fetch(refs):
+        details = client._fetch_pull_request(pull_request)
+        records[pull_request.id] = client.parse_pull_request(pull_request, details=details)
+    return records
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--prs", type=int, default=50)
+    args = parser.parse_args()
+
+    logging.disable(logging.ERROR)
+    fake = FakeGitHub(pull_requests=args.prs).start()
+    scenario = Scenario(fake)
+    ok = True
+    try:
+        scenario.update()
+        client = scenario.client
+        session = client._client.session
+        backends = {
+            "rest": RestBackend(client._client, client.CONFIG["enrichment_workers"]),
+            "graphql": GraphQLBackend(
+                client._client,
+                graphql_url(session.base_url),
+                client.CONFIG["graphql_batch_size"],
+            ),
+        }
+        refs = sorted(fake.pulls)
+        records = {}
+        for name, backend in backends.items():
+            fake.reset_counts()
+            records[name] = parse_all(client, backend, refs)
+            print(f"  {name}: {sum(fake.requests.values())} requests")
+        ok &= check(len(records["rest"]) == len(refs), "every PR is fetched")
+        differing = [
+            id_
+            for id_ in records["rest"]
+            if canonical(records["rest"][id_])
+            != canonical(records["graphql"].get(id_, {}))
+        ]
+        for id_ in differing[:5]:
+            print(f"  {id_}: {records['rest'][id_]} != {records['graphql'].get(id_)}")
+        ok &= check(
+            not differing and records["rest"].keys() == records["graphql"].keys(),
+            "the records are the same with both backends",
+        )
+    finally:
+        scenario.close()
+        fake.stop()
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
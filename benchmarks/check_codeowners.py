@@ -0,0 +1,92 @@
+"""Check: `CodeOwners` matches paths as its rules' regexes do
+
+The compiled matcher only tests a path against the rules indexed under its
+segments. This compares it with testing every rule, last first, on random
+CODEOWNERS files mixing the kinds of pattern it indexes differently, including the
+root pattern `/`, and on a few fixed cases. Run from the repo root:
+
+    python benchmarks/check_codeowners.py [--files 2000]
+"""
+import argparse
+import random
+import re
+import sys
+
+from github_menubar.codeowners import CodeOwners, pattern_to_regex
+
+PATTERNS = [
+    "*",
+    "/",
+    "**",
+    "*.py",
+    "docs/",
+    "/docs/",
+    "docs",
+    "/src/app/",
+    "src/*.py",
+    "**/tests/",
+    "**/README.md",
+    "/src/**/models.py",
+    "app",
+    "/app?/",
+    "lib/**",
+]
+PATHS = [
+    "README.md",
+    "setup.py",
+    "docs/index.md",
+    "src/app/main.py",
+    "src/app/tests/test_main.py",
+    "src/lib/models.py",
+    "lib/docs/guide.md",
+    "app1/config.yml",
+    "app/README.md",
+    "tests/conftest.py",
+]
+FIXED = [
+    ("/ @root", "a/b.py", ("root",)),
+    ("/ @root\n/docs/ @docs", "docs/index.md", ("docs",)),
+    ("/docs/ @docs\n/ @root", "docs/index.md", ("root",)),
+    ("* @everyone\n/src/ @src", "README.md", ("everyone",)),
+]
+
+
+def reference_owners(rules, filename):
+    for path, owners in reversed(rules):
+        if re.fullmatch(pattern_to_regex(path), filename):
+            return tuple(owners)
+    return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--files", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    ok = True
+    for contents, filename, expected in FIXED:
+        owners = CodeOwners.parse(contents).owners(filename)
+        if owners != expected:
+            print(f"  {contents!r}: {filename} owned by {owners}, expected {expected}")
+            ok = False
+    print(f"fixed cases: {'ok' if ok else 'FAIL'}")
+
+    rng = random.Random(args.seed)
+    mismatches = 0
+    for _ in range(args.files):
+        n_rules = rng.randint(1, 6)
+        rules = [(rng.choice(PATTERNS), (f"owner{i}",)) for i in range(n_rules)]
+        codeowners = CodeOwners(rules)
+        for filename in PATHS:
+            if codeowners.owners(filename) != reference_owners(rules, filename):
+                mismatches += 1
+                if mismatches <= 5:
+                    print(f"  mismatch: {filename} with {rules}")
+    print(f"random files: {mismatches} of {args.files * len(PATHS)} paths differ")
+    ok &= not mismatches
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
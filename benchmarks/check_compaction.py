@@ -0,0 +1,127 @@
+"""Check: `CompactionPolicy` packs when it should, and only then
+
+Runs a `CompactionPolicy` over a FileStorage database in a temporary directory, with
+a fake clock, and checks that:
+
+ - nothing is due right after the policy starts counting
+ - a pack is due once the file has grown by `growth_bytes`, or `max_age` seconds
+   after the last pack, and not before
+ - `run` skips the pack while a `reading()` lock is held, and packs once it is
+   released
+ - the time and size of the last pack are saved, and a new policy picks them up
+
+Run from the repo root:
+
+    python benchmarks/check_compaction.py
+"""
+import json
+import logging
+import os
+import sys
+import tempfile
+
+import transaction
+from ZODB import DB
+from ZODB.FileStorage import FileStorage
+
+from github_menubar.compaction import CompactionPolicy, reading
+
+GROWTH = 64 * 1024
+MAX_AGE = 3600
+
+
+def check(condition, message):
+    print(f"  {'ok  ' if condition else 'FAIL'} {message}")
+    return condition
+
+
+class FakeClock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def grow(db, path, size):
+    """Rewrite one record until the file at `path` is at least `size` bytes"""
+    conn = db.open()
+    while os.path.getsize(path) < size:
+        conn.root()["record"] = "x" * 4096 + str(os.path.getsize(path))
+        transaction.commit()
+    conn.close()
+
+
+def main():
+    # the policy logs every pack and every skipped one
+    logging.disable(logging.INFO)
+    tmp = tempfile.mkdtemp()
+    path = os.path.join(tmp, "gmb.fs")
+    lock_path = os.path.join(tmp, "readers.lock")
+    db = DB(FileStorage(path))
+    clock = FakeClock()
+
+    def policy():
+        return CompactionPolicy(
+            db, path, GROWTH, MAX_AGE, lock_path=lock_path, clock=clock
+        )
+
+    compaction = policy()
+    ok = check(compaction.due() is None, "nothing is due when the policy starts")
+    grow(db, path, compaction.packed_size + GROWTH - 4096 * 2)
+    ok &= check(compaction.due() is None, "nor before the file grows by growth_bytes")
+    grow(db, path, compaction.packed_size + GROWTH)
+    ok &= check(
+        (compaction.due() or "").startswith("grew by"), "but once it has, a pack is due"
+    )
+
+    with reading(lock_path):
+        skipped = compaction.run()
+    ok &= check(
+        skipped is None and compaction.packed_at == 1000.0,
+        "the pack is skipped while a read holds the lock",
+    )
+    ok &= check(not os.path.exists(compaction.state_path), "and nothing is saved")
+
+    clock.now += 10
+    size = os.path.getsize(path)
+    result = compaction.run()
+    ok &= check(
+        result is not None and result["bytes_reclaimed"] > 0,
+        "once the read is done the database is packed",
+    )
+    ok &= check(
+        compaction.packed_at == clock.now
+        and compaction.packed_size == os.path.getsize(path) < size,
+        "and the time and size of the pack are recorded",
+    )
+    with open(compaction.state_path) as fi:
+        saved = json.load(fi)
+    ok &= check(
+        saved == {"packed_at": clock.now, "size": os.path.getsize(path)},
+        "and saved",
+    )
+    ok &= check(compaction.due() is None, "nothing is due right after a pack")
+
+    clock.now += 1
+    restarted = policy()
+    ok &= check(
+        restarted.packed_at == saved["packed_at"]
+        and restarted.packed_size == saved["size"],
+        "a new policy picks up the saved pack",
+    )
+    clock.now = saved["packed_at"] + MAX_AGE - 1
+    ok &= check(restarted.due() is None, "nothing is due before max_age has passed")
+    clock.now = saved["packed_at"] + MAX_AGE
+    ok &= check(
+        (restarted.due() or "").startswith("last packed"),
+        "but once it has, a pack is due",
+    )
+    ok &= check(restarted.run() is not None, "and run packs it")
+    ok &= check(restarted.run() is None, "and doesn't pack again until due")
+    db.close()
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,182 @@
+"""Check: the staged update pipeline against a local fake GitHub
+
+Runs `GitHubClient.update` against `fake_github.FakeGitHub`, each scenario on a new
+database served by its own ZEO server, and checks that:
+
+ - the state stored with one enrichment worker and with several is the same
+ - every open PR the fake says involves the user, and every notification, is stored
+ - when GitHub fails part way through enrichment, the update raises, nothing it
+   staged is committed, and the next update succeeds
+ - when a stored PR is deleted from GitHub, the next update drops it
+
+It also prints how long each update took, with `--latency` seconds added to every
+request. Run from the repo root:
+
+    python benchmarks/check_pipeline.py [--prs 50] [--latency 0.02]
+"""
+import argparse
+import json
+import logging
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+# point the config and database at a scratch directory before github_menubar is imported
+os.environ["HOME"] = tempfile.mkdtemp()
+os.makedirs(os.path.join(os.environ["HOME"], ".github_menubar"))
+
+from bench_state_client import free_port  # noqa: E402
+from fake_github import FakeGitHub  # noqa: E402
+
+from github_menubar.config import CONFIG, DEFAULT_CONFIG  # noqa: E402
+from github_menubar.github_client import GitHubClient  # noqa: E402
+
+
+def canonical(state):
+    """`state` as a string that only depends on its contents"""
+
+    def encode(value):
+        if isinstance(value, (set, frozenset)):
+            return sorted(value)
+        if hasattr(value, "isoformat"):
+            return value.isoformat()
+        return list(value)
+
+    state = {k: v for k, v in state.items() if k not in ("last_update", "schedule")}
+    return json.dumps(state, default=encode, sort_keys=True)
+
+
+class Scenario:
+    """A new database and ZEO server, and a config pointing GMB at `fake`"""
+
+    def __init__(self, fake, **config):
+        self.port = free_port()
+        path = os.path.join(tempfile.mkdtemp(), "db")
+        self.server = subprocess.Popen(
+            [sys.executable, "-m", "ZEO.runzeo", "-a", str(self.port), "-f", path],
+            stderr=subprocess.DEVNULL,
+        )
+        config = dict(
+            user=fake.user,
+            token="check",
+            port=self.port,
+            api_url=fake.url,
+            desktop_notifications="false",
+            http_cache_size_mb=0,
+            **config,
+        )
+        text = DEFAULT_CONFIG
+        for key, value in config.items():
+            lines = [
+                f"{key}: {value}" if line.startswith(f"{key}:") else line
+                for line in text.splitlines()
+            ]
+            text = "\n".join(lines) + "\n"
+        with open(CONFIG["config_file_path"], "w") as fo:
+            fo.write(text)
+        self.client = GitHubClient()
+
+    def update(self):
+        start = time.perf_counter()
+        self.client.update()
+        return time.perf_counter() - start
+
+    def close(self):
+        self.client.db.close()
+        self.server.terminate()
+
+
+def check(condition, message):
+    print(f"  {'ok  ' if condition else 'FAIL'} {message}")
+    return condition
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--prs", type=int, default=50)
+    parser.add_argument("--notifications", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=0.02)
+    args = parser.parse_args()
+
+    # without a running server to render for, rendering the snapshot after each
+    # update fails and logs an error
+    logging.disable(logging.ERROR)
+    fake = FakeGitHub(
+        pull_requests=args.prs, notifications=args.notifications, latency=args.latency
+    ).start()
+    ok = True
+    states = {}
+    print(f"{args.prs} PRs, {args.notifications} notifications, {args.latency}s latency")
+    for workers in (1, 8):
+        scenario = Scenario(fake, enrichment_workers=workers)
+        try:
+            # the user's teams are only known, and searched, from the second update
+            times = [scenario.update(), scenario.update()]
+            print(
+                f"  updates with {workers} workers: "
+                f"{times[0]:.2f}s (new database), {times[1]:.2f}s"
+            )
+            states[workers] = scenario.client.get_state(complete=True)
+        finally:
+            scenario.close()
+    ok &= check(
+        canonical(states[1]) == canonical(states[8]), "same state with 1 and 8 workers"
+    )
+    state = states[8]
+    involved = {pr["id"] for pr in fake.search(f"is:open involves:{fake.user}")}
+    ok &= check(involved <= set(state["pull_requests"]), "every involved PR is stored")
+    ok &= check(
+        {int(id_) for id_ in fake.notifications} == set(state["notifications"]),
+        "every notification is stored",
+    )
+
+    scenario = Scenario(fake, enrichment_workers=8)
+    try:
+        fake.failing = {"check_runs"}
+        try:
+            scenario.update()
+            failed = False
+        except Exception:
+            failed = True
+        ok &= check(failed, "an update raises when GitHub fails during enrichment")
+        ok &= check(
+            not scenario.client.get_state(complete=True)["pull_requests"],
+            "nothing from the failed update is committed",
+        )
+        fake.failing = set()
+        # the failed update did learn the user's teams
+        scenario.update()
+        ok &= check(
+            canonical(scenario.client.get_state(complete=True)) == canonical(state),
+            "the next update stores the same state",
+        )
+        # one of the user's own PRs, which are refreshed every update, deleted
+        notified = {
+            (notif["org"], notif["repo"], notif["number"])
+            for notif in fake.notifications.values()
+        }
+        key = next(
+            key
+            for key, pr in fake.pulls.items()
+            if pr["author"] == fake.user and key not in notified
+        )
+        deleted = fake.pulls.pop(key)
+        try:
+            scenario.update()
+            failed = False
+        except Exception:
+            failed = True
+        fake.pulls[key] = deleted
+        ok &= check(not failed, "an incremental update succeeds after a PR is deleted")
+        stored = scenario.client.get_state(complete=True)["pull_requests"]
+        ok &= check(deleted["id"] not in stored, "and drops the deleted PR")
+    finally:
+        scenario.close()
+        fake.stop()
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
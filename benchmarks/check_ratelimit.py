@@ -0,0 +1,209 @@
+"""Check: the rate limiter throttles, pauses and plans updates as it should
+
+Drives `TokenBucket`, `RateLimiter` and `plan_interval` with a fake clock, whose
+sleeps only move it forward, and a session that answers with scripted responses.
+Checks that:
+
+ - the token bucket allows a burst of `capacity` calls, then waits `1 / rate` for
+   each further one
+ - a rate limit error with `Retry-After`, or with `X-RateLimit-Remaining: 0`, pauses
+   until then and retries
+ - a secondary rate limit without either backs off, doubling the pause each time it
+   is hit again, until a request gets through
+ - a pause longer than `max_wait` raises `RateLimited` instead of sleeping
+ - an ordinary 403 is returned as it is, and 304s aren't counted
+ - `plan_interval` stretches the interval so the remaining budget lasts until the
+   reset, and waits for the reset once a budget is used up
+
+Run from the repo root:
+
+    python benchmarks/check_ratelimit.py
+"""
+import logging
+import sys
+
+from check_pipeline import check
+import requests
+
+from github_menubar.ratelimit import (
+    plan_interval,
+    RateLimited,
+    RateLimiter,
+    TokenBucket,
+)
+
+API = "https://api.github.com"
+
+
+class FakeClock:
+    """A clock that only moves when something sleeps"""
+
+    def __init__(self, now=1000.0):
+        self.now = now
+        self.sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+def response(status, headers=None, text=""):
+    resp = requests.Response()
+    resp.status_code = status
+    resp.headers.update(headers or {})
+    resp._content = text.encode()
+    return resp
+
+
+class ScriptedSession:
+    """Answers each request with the next of `responses`"""
+
+    def __init__(self, *responses):
+        self.responses = list(responses)
+        self.sent = 0
+
+    def request(self, method, url, *args, **kwargs):
+        self.sent += 1
+        return self.responses.pop(0)
+
+
+def limited(clock, *responses, **kwargs):
+    """A session answering with `responses`, with a `RateLimiter` installed"""
+    session = ScriptedSession(*responses)
+    limiter = RateLimiter(0, clock=clock, sleep=clock.sleep, **kwargs)
+    limiter.install(session)
+    return session, limiter
+
+
+def check_bucket():
+    clock = FakeClock()
+    bucket = TokenBucket(rate=2, capacity=3, clock=clock, sleep=clock.sleep)
+    for _ in range(3):
+        bucket.acquire()
+    ok = check(not clock.sleeps, "the token bucket allows a burst of its capacity")
+    bucket.acquire()
+    bucket.acquire()
+    ok &= check(clock.sleeps == [0.5, 0.5], "then waits 1 / rate for each call")
+    clock.now += 10
+    del clock.sleeps[:]
+    for _ in range(3):
+        bucket.acquire()
+    ok &= check(not clock.sleeps, "and refills, up to its capacity, while idle")
+    return ok
+
+
+def check_limiter():
+    clock = FakeClock()
+    session, limiter = limited(
+        clock, response(429, {"Retry-After": "5"}), response(200)
+    )
+    result = session.request("GET", f"{API}/user")
+    ok = check(
+        result.status_code == 200 and clock.sleeps == [5] and session.sent == 2,
+        "Retry-After pauses for that long, then retries",
+    )
+
+    clock = FakeClock()
+    reset = {"X-RateLimit-Remaining": "0", "X-RateLimit-Reset": str(int(clock()) + 30)}
+    session, limiter = limited(clock, response(403, reset), response(200))
+    result = session.request("GET", f"{API}/user")
+    ok &= check(
+        result.status_code == 200 and clock.sleeps == [30],
+        "X-RateLimit-Remaining: 0 pauses until X-RateLimit-Reset",
+    )
+
+    clock = FakeClock()
+    secondary = "You have exceeded a secondary rate limit."
+    session, limiter = limited(
+        clock,
+        response(403, text=secondary),
+        response(403, text=secondary),
+        response(200),
+        response(403, text=secondary),
+        response(200),
+        backoff=10,
+    )
+    session.request("GET", f"{API}/user")
+    ok &= check(clock.sleeps == [10, 20], "a secondary rate limit doubles the backoff")
+    session.request("GET", f"{API}/user")
+    ok &= check(
+        clock.sleeps == [10, 20, 10], "which starts over once a request gets through"
+    )
+    ok &= check(limiter.counts["core"] == 2, "each request is counted once")
+
+    clock = FakeClock()
+    session, limiter = limited(
+        clock, response(429, {"Retry-After": "120"}), max_wait=60
+    )
+    try:
+        session.request("GET", f"{API}/user")
+        raised = None
+    except RateLimited as error:
+        raised = error
+    ok &= check(
+        raised is not None and raised.until == clock() + 120 and not clock.sleeps,
+        "a pause longer than max_wait raises RateLimited",
+    )
+    try:
+        session.request("GET", f"{API}/user")
+        raised_again = False
+    except RateLimited:
+        raised_again = True
+    ok &= check(
+        raised_again and session.sent == 1, "and so does every request until then"
+    )
+
+    clock = FakeClock()
+    session, limiter = limited(
+        clock, response(403, text="Resource not accessible"), response(304)
+    )
+    result = session.request("GET", f"{API}/repos/org/repo/branches/main/protection")
+    ok &= check(
+        result.status_code == 403 and not clock.sleeps and session.sent == 1,
+        "an ordinary 403 is returned without pausing",
+    )
+    session.request("GET", f"{API}/search/issues")
+    ok &= check(
+        limiter.counts == {"core": 1, "search": 0, "graphql": 0},
+        "a 304 isn't counted against the budget",
+    )
+    return ok
+
+
+def check_plan():
+    now = 1000
+    budget = {"limit": 5000, "remaining": 1000, "reset": now + 3600}
+    planned = plan_interval({"core": budget}, {"core": 100}, 60, 3600, now=now)
+    ok = check(planned == 360, "the interval stretches so the budget lasts the hour")
+    planned = plan_interval({"core": budget}, {"core": 1}, 60, 3600, now=now)
+    ok &= check(planned == 60, "but is never shorter than the configured interval")
+    planned = plan_interval({"core": budget}, {"core": 100}, 60, 300, now=now)
+    ok &= check(planned == 300, "or longer than max_interval")
+    planned = plan_interval(
+        {"core": budget}, {"core": 100}, 60, 3600, reserve=0.1, now=now
+    )
+    ok &= check(planned == 720, "a reserve is left out of the budget")
+    spent = dict(budget, remaining=50)
+    planned = plan_interval({"core": spent}, {"core": 100}, 60, 300, now=now)
+    ok &= check(planned == 3600, "an exhausted budget waits for its reset")
+    planned = plan_interval(
+        {"core": budget, "search": spent}, {"core": 100}, 60, 3600, now=now
+    )
+    ok &= check(planned == 360, "budgets the last update didn't use are ignored")
+    return ok
+
+
+def main():
+    # the limiter warns about every pause, which are all expected here
+    logging.disable(logging.WARNING)
+    ok = check_bucket()
+    ok &= check_limiter()
+    ok &= check_plan()
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""Check: `ResponseCache` revalidates, replays, evicts and saves as it should
+
+Installs a `ResponseCache` on a requests session pointed at a local
+`fake_github.FakeGitHub`, and checks that:
+
+ - a repeated GET is sent conditionally, and the 304 is replayed as the cached 200
+   with the current `X-RateLimit-*` headers
+ - requests that already carry conditional headers are passed through untouched
+ - once the cached bodies exceed `max_bytes`, the least recently used entry is
+   evicted
+ - `save` only writes the cache when something was cached since the last save, and
+   a new cache loads what was saved
+
+Run from the repo root:
+
+    python benchmarks/check_session.py
+"""
+import os
+import sys
+import tempfile
+
+from check_pipeline import check
+from fake_github import FakeGitHub
+import requests
+
+from github_menubar.session import ResponseCache
+
+
+def main():
+    ok = True
+    with FakeGitHub() as fake:
+        urls = [f"{fake.api}/repos/org0/repo{i}" for i in range(3)]
+        sizes = [len(requests.get(url).content) for url in urls]
+        path = os.path.join(tempfile.mkdtemp(), "http_cache.pickle")
+        # room for all but the smallest body, so adding the third evicts one
+        cache = ResponseCache(path, sum(sizes) - min(sizes))
+        session = requests.Session()
+        cache.install(session)
+
+        first = session.get(urls[0])
+        replayed = session.get(urls[0])
+        ok &= check(
+            replayed.status_code == 200 and replayed.content == first.content,
+            "a 304 is replayed as the cached 200",
+        )
+        ok &= check(cache.hits == 1 and cache.misses == 1, "and counted as a hit")
+        ok &= check(
+            int(replayed.headers["X-RateLimit-Remaining"])
+            < int(first.headers["X-RateLimit-Remaining"]),
+            "with the 304's rate limit headers, not the cached ones",
+        )
+        conditional = session.get(
+            urls[0], headers={"If-None-Match": first.headers["ETag"]}
+        )
+        ok &= check(
+            conditional.status_code == 304 and cache.hits == 1 and cache.misses == 1,
+            "a request with its own conditional headers is passed through",
+        )
+
+        session.get(urls[1])
+        # makes the first URL the most recently used
+        session.get(urls[0])
+        session.get(urls[2])
+        cached = {key[0] for key in cache._entries}
+        ok &= check(
+            cached == {urls[0], urls[2]}, "the least recently used entry is evicted"
+        )
+
+        cache.save()
+        ok &= check(os.path.exists(path), "save writes the cache")
+        os.remove(path)
+        session.get(urls[0])
+        cache.save()
+        ok &= check(not os.path.exists(path), "but not again if nothing was cached")
+        session.get(urls[1])
+        cache.save()
+        ok &= check(os.path.exists(path), "and again once something was")
+        loaded = ResponseCache(path)
+        ok &= check(
+            loaded.get((urls[1], None)) is not None, "a new cache loads what was saved"
+        )
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""Check: `UnitOfWork` keeps what the user changes while an update runs
+
+Stages an update's changes to a PR and a notification in a `UnitOfWork` on an
+in-memory database, mutes the PR and clears the notification in another
+transaction, as the menu does while an update runs, then commits the unit of work.
+Checks that the update's changes are written and that the PR is still muted and
+the notification still cleared. Run from the repo root:
+
+    python benchmarks/check_storage.py
+"""
+import sys
+
+from ZODB import DB
+from ZODB.PersistentMapping import PersistentMapping
+
+from github_menubar.storage import init_root, UnitOfWork
+
+
+def check(condition, message):
+    print(f"  {'ok  ' if condition else 'FAIL'} {message}")
+    return condition
+
+
+def main():
+    db = DB(None)
+    with db.transaction() as conn:
+        init_root(conn.root)
+        for id_ in (1, 2):
+            conn.root.pull_requests[id_] = PersistentMapping(
+                {"id": id_, "title": "Old title", "muted": False}
+            )
+        conn.root.notifications[10] = PersistentMapping(
+            {"pr_id": 1, "updated_at": 1, "cleared": False}
+        )
+
+    uow = UnitOfWork(db)
+    uow.put("pull_requests", 1, dict(uow["pull_requests"][1], title="New title"))
+    # staged unchanged, as updates do for PRs they refetched
+    uow.put("pull_requests", 2, dict(uow["pull_requests"][2]))
+    uow.put("notifications", 10, dict(uow["notifications"][10], updated_at=2))
+    uow.put("pull_requests", 3, {"id": 3, "title": "New PR", "muted": False})
+    with db.transaction() as conn:
+        conn.root.pull_requests[1]["muted"] = True
+        conn.root.pull_requests[2]["muted"] = True
+        conn.root.notifications[10]["cleared"] = True
+    uow.commit()
+
+    ok = True
+    with db.transaction() as conn:
+        pull_requests = conn.root.pull_requests
+        notification = conn.root.notifications[10]
+        ok &= check(pull_requests[1]["title"] == "New title", "the PR is updated")
+        ok &= check(pull_requests[1]["muted"], "a PR muted meanwhile stays muted")
+        ok &= check(pull_requests[2]["muted"], "so does one the update didn't change")
+        ok &= check(notification["updated_at"] == 2, "the notification is updated")
+        ok &= check(notification["cleared"], "one cleared meanwhile stays cleared")
+        ok &= check(not pull_requests[3]["muted"], "a new PR is stored unmuted")
+    db.close()
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
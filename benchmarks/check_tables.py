@@ -0,0 +1,113 @@
+"""Check: `format_table` lays out tables exactly as tabulate does
+
+Compares `github_menubar.tables.format_table` with
+`tabulate(rows, headers, tablefmt="plain")`, the golden output, on:
+
+ - whole menus rendered by `BitBarRenderer` for the synthetic states of
+   `bench_render`, once with each formatter
+ - random tables mixing the cells the menu puts in them (text, Nerd Font glyphs)
+   with ones that need care: wide characters, surrounding whitespace, numbers,
+   booleans, empty and multi-line cells
+
+It also times both formatters on the rendered menus. Run from the repo root:
+
+    python benchmarks/check_tables.py [--tables 20000] [--size 5000]
+"""
+import argparse
+import random
+import sys
+import time
+
+from bench_render import pid_file, render_state, StaticClient, write_config
+from tabulate import tabulate
+
+from github_menubar import renderers
+from github_menubar.config import GLYPHS
+from github_menubar.tables import format_table
+
+CELLS = [
+    "",
+    " ",
+    "dev0",
+    "  padded  ",
+    "org/repo 12: Fix the thing",
+    "clean",
+    "OPEN",
+    "中文标题",
+    "ｆｕｌｌ",
+    "café",
+    "emoji 🎉",
+    "0",
+    "42",
+    "-3.5",
+    "1e3",
+    "nan",
+    "True",
+    "False",
+    "two\nlines",
+    *GLYPHS.values(),
+]
+
+
+def golden(rows, headers=()):
+    return tabulate(rows, headers=list(headers), tablefmt="plain").split("\n")
+
+
+def random_table(rng):
+    n_columns = rng.randint(1, 5)
+    rows = [
+        [rng.choice(CELLS) for _ in range(n_columns)] for _ in range(rng.randint(1, 6))
+    ]
+    # columns of one kind of cell, to get numeric and boolean columns
+    for column in range(n_columns):
+        if rng.random() < 0.2:
+            kind = rng.choice(CELLS)
+            for row in rows:
+                row[column] = kind
+    headers = [rng.choice(CELLS) for _ in range(n_columns)] if rng.random() < 0.5 else []
+    return rows, headers
+
+
+def render(formatter, client):
+    renderers.format_table = formatter
+    return renderers.BitBarRenderer(client=client).render()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tables", type=int, default=20000)
+    parser.add_argument("--size", type=int, default=5000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    ok = True
+    rng = random.Random(args.seed)
+    mismatches = 0
+    for _ in range(args.tables):
+        rows, headers = random_table(rng)
+        if format_table(rows, headers) != golden(rows, headers):
+            mismatches += 1
+            if mismatches <= 5:
+                print(f"  mismatch: rows={rows!r} headers={headers!r}")
+    print(f"random tables: {mismatches} of {args.tables} differ")
+    ok &= not mismatches
+
+    write_config()
+    client = StaticClient(render_state(args.size, args.size))
+    times = {}
+    menus = {}
+    with pid_file():
+        for name, formatter in (("tabulate", golden), ("format_table", format_table)):
+            start = time.perf_counter()
+            menus[name] = render(formatter, client)
+            times[name] = time.perf_counter() - start
+    same = menus["tabulate"] == menus["format_table"]
+    print(f"menu for {args.size} PRs and notifications: {'same' if same else 'DIFFERS'}")
+    for name, seconds in times.items():
+        print(f"  render with {name:<14}{seconds * 1000:8.1f} ms")
+    ok &= same
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,935 @@
+"""A local fake of the parts of the GitHub REST API used by GitHubMenuBar
+
+The server is seeded with a synthetic, deterministic data set (orgs, teams, repos,
+pull requests, reviews, files, check runs, CODEOWNERS and notifications) and counts
+every request it serves by endpoint. Point a client at it by setting ``api_url`` in
+the GMB config to ``FakeGitHub.url``.
+"""
+import base64
+from collections import Counter
+import datetime
+import hashlib
+import http.server
+import json
+import random
+import re
+import threading
+import time
+import zlib
+from urllib.parse import parse_qs, urlparse
+
+USER_FIELDS = (
+    "avatar_url",
+    "events_url",
+    "followers_url",
+    "following_url",
+    "gists_url",
+    "html_url",
+    "organizations_url",
+    "received_events_url",
+    "repos_url",
+    "starred_url",
+    "subscriptions_url",
+)
+REPO_URL_FIELDS = (
+    "archive_url",
+    "assignees_url",
+    "blobs_url",
+    "branches_url",
+    "collaborators_url",
+    "comments_url",
+    "commits_url",
+    "compare_url",
+    "contents_url",
+    "contributors_url",
+    "deployments_url",
+    "downloads_url",
+    "events_url",
+    "forks_url",
+    "git_commits_url",
+    "git_refs_url",
+    "git_tags_url",
+    "hooks_url",
+    "issue_comment_url",
+    "issue_events_url",
+    "issues_url",
+    "keys_url",
+    "labels_url",
+    "languages_url",
+    "merges_url",
+    "milestones_url",
+    "notifications_url",
+    "pulls_url",
+    "releases_url",
+    "stargazers_url",
+    "statuses_url",
+    "subscribers_url",
+    "subscription_url",
+    "tags_url",
+    "teams_url",
+    "trees_url",
+)
+MERGEABLE_STATES = ("clean", "clean", "blocked", "behind", "dirty", "unstable", "unknown")
+REVIEW_STATES = ("APPROVED", "COMMENTED", "CHANGES_REQUESTED", "APPROVED")
+CONCLUSIONS = ("success", "success", "success", "failure", "cancelled")
+EPOCH = datetime.datetime(2020, 1, 1, tzinfo=datetime.timezone.utc)
+RATE_LIMIT = 5000
+
+
+def _timestamp(minutes):
+    return (EPOCH + datetime.timedelta(minutes=minutes)).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+def _parse_timestamp(value):
+    value = value.replace("Z", "+00:00")
+    parsed = datetime.datetime.fromisoformat(value)
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=datetime.timezone.utc)
+    return parsed
+
+
+class FakeGitHub:
+    """Synthetic GitHub data plus a threaded HTTP server that serves it
+
+    Args:
+        user: login of the user GMB runs as
+        orgs: number of organizations
+        repos_per_org: number of repositories per organization
+        pull_requests: total number of open pull requests
+        files_per_pr: number of changed files per pull request
+        reviews_per_pr: number of reviews per pull request
+        check_runs: number of check runs on each head commit
+        codeowners_rules: number of rules in each repository's CODEOWNERS file
+        teams_per_org: number of teams in each organization
+        members_per_team: number of members of each team
+        notifications: number of unread notification threads
+        latency: seconds to wait before answering each request, to simulate the network
+        seed: random seed for the synthetic data
+
+    Requests to the endpoints named in `failing` (e.g. "check_runs") are answered
+    with a 500, to simulate GitHub failing part way through an update.
+    """
+
+    def __init__(
+        self,
+        user="octocat",
+        orgs=2,
+        repos_per_org=3,
+        pull_requests=50,
+        files_per_pr=5,
+        reviews_per_pr=2,
+        check_runs=3,
+        codeowners_rules=20,
+        teams_per_org=3,
+        members_per_team=5,
+        notifications=20,
+        latency=0.0,
+        seed=0,
+    ):
+        self.user = user
+        self.latency = latency
+        self.failing = set()
+        self.requests = Counter()
+        self.lock = threading.Lock()
+        self._server = None
+        self._thread = None
+        self.url = None
+        rng = random.Random(seed)
+        self.orgs = {}
+        self.repos = {}
+        self.pulls = {}
+        self.notifications = {}
+        self.comments = {}
+        self.notifications_modified = _timestamp(0)
+        people = [f"dev{i}" for i in range(max(members_per_team * 2, 10))]
+        for o in range(orgs):
+            org = f"org{o}"
+            teams = {}
+            for t in range(teams_per_org):
+                members = rng.sample(people, min(members_per_team, len(people)))
+                if t == 0:
+                    members.append(user)
+                teams[f"team-{t}"] = {"id": o * 1000 + t + 1, "members": members}
+            self.orgs[org] = {"id": o + 1, "teams": teams}
+            for r in range(repos_per_org):
+                repo = f"repo{r}"
+                rules = ["* @dev0"]
+                for i in range(codeowners_rules - 1):
+                    team = rng.choice(list(teams))
+                    owner = f"@{org}/{team}" if i % 2 else f"@{rng.choice(people)}"
+                    rules.append(f"/src/module{i}/ {owner}")
+                self.repos[(org, repo)] = {
+                    "id": len(self.repos) + 1,
+                    "codeowners": "\n".join(rules) + "\n",
+                    "protected_contexts": ["check-0", "check-1"],
+                    "next_number": 1,
+                }
+        repo_keys = list(self.repos)
+        for p in range(pull_requests):
+            org, repo = repo_keys[p % len(repo_keys)]
+            repo_info = self.repos[(org, repo)]
+            number = repo_info["next_number"]
+            repo_info["next_number"] += 1
+            author = user if p % 4 == 0 else rng.choice(people)
+            runs = []
+            for c in range(check_runs):
+                in_progress = rng.random() < 0.1
+                runs.append(
+                    {
+                        "id": p * 100 + c + 1,
+                        "name": f"check-{c}",
+                        "status": "in_progress" if in_progress else "completed",
+                        "conclusion": None if in_progress else rng.choice(CONCLUSIONS),
+                    }
+                )
+            team = rng.choice(list(self.orgs[org]["teams"]))
+            self.pulls[(org, repo, number)] = {
+                "id": 100000 + p,
+                "issue_id": 500000 + p,
+                "number": number,
+                "org": org,
+                "repo": repo,
+                "title": f"Synthetic change {p}",
+                "author": author,
+                "state": "open",
+                "merged": False,
+                "mergeable_state": rng.choice(MERGEABLE_STATES),
+                "base": "main",
+                "head": f"feature-{p}",
+                "sha": hashlib.sha1(f"{org}/{repo}/{number}".encode()).hexdigest(),
+                "updated_at": _timestamp(p),
+                "mentions": [user] if p % 3 == 0 else [],
+                "teams": [f"{org}/{team}"],
+                "files": [
+                    f"src/module{rng.randrange(max(codeowners_rules - 1, 1))}/file{f}.py"
+                    for f in range(files_per_pr)
+                ],
+                "reviews": [
+                    {"id": p * 100 + i + 1, "user": rng.choice(people), "state": rng.choice(REVIEW_STATES)}
+                    for i in range(reviews_per_pr)
+                ],
+                "check_runs": runs,
+            }
+        pull_keys = list(self.pulls)
+        for n in range(min(notifications, len(pull_keys))):
+            org, repo, number = pull_keys[(n * 7) % len(pull_keys)]
+            comment_id = 900000 + n
+            self.comments[comment_id] = {
+                "id": comment_id,
+                "org": org,
+                "repo": repo,
+                "body": f"Synthetic comment {n}",
+                "user": rng.choice(people),
+            }
+            self.notifications[str(700000 + n)] = {
+                "id": str(700000 + n),
+                "org": org,
+                "repo": repo,
+                "number": number,
+                "reason": "mention" if n % 2 else "review_requested",
+                "comment_id": comment_id,
+                "updated_at": _timestamp(n),
+                "unread": True,
+            }
+
+    # -- lifecycle ---------------------------------------------------------------
+
+    def start(self):
+        """Start serving on an ephemeral localhost port"""
+        fake = self
+
+        class Handler(_Handler):
+            github = fake
+
+        self._server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self._server.server_address[1]}"
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def reset_counts(self):
+        with self.lock:
+            self.requests.clear()
+
+    def touch(self, pull_request, minutes):
+        """Mark a pull request as updated, as activity on GitHub would"""
+        pull_request["updated_at"] = _timestamp(minutes)
+
+    # -- JSON builders -----------------------------------------------------------
+
+    @property
+    def api(self):
+        return f"{self.url}/api/v3"
+
+    def _user(self, login):
+        data = {field: f"{self.api}/users/{login}" for field in USER_FIELDS}
+        data.update(
+            {
+                "login": login,
+                "id": zlib.crc32(login.encode()) % 100000,
+                "gravatar_id": "",
+                "site_admin": False,
+                "type": "User",
+                "url": f"{self.api}/users/{login}",
+                "events_url": f"{self.api}/users/{login}/events{{/privacy}}",
+                "following_url": f"{self.api}/users/{login}/following{{/other_user}}",
+                "gists_url": f"{self.api}/users/{login}/gists{{/gist_id}}",
+                "starred_url": f"{self.api}/users/{login}/starred{{/owner}}{{/repo}}",
+            }
+        )
+        return data
+
+    def _repo(self, org, repo):
+        url = f"{self.api}/repos/{org}/{repo}"
+        data = {field: f"{url}/{field[:-4]}" for field in REPO_URL_FIELDS}
+        data.update(
+            {
+                "id": self.repos[(org, repo)]["id"],
+                "name": repo,
+                "full_name": f"{org}/{repo}",
+                "owner": self._user(org),
+                "private": False,
+                "fork": False,
+                "description": "",
+                "url": url,
+                "html_url": f"{self.url}/{org}/{repo}",
+                "archived": False,
+                "clone_url": f"{self.url}/{org}/{repo}.git",
+                "created_at": _timestamp(0),
+                "default_branch": "main",
+                "forks_count": 0,
+                "git_url": "",
+                "has_downloads": True,
+                "has_issues": True,
+                "has_pages": False,
+                "has_projects": False,
+                "has_wiki": False,
+                "homepage": "",
+                "language": "Python",
+                "mirror_url": None,
+                "network_count": 0,
+                "open_issues_count": 0,
+                "pushed_at": _timestamp(0),
+                "size": 1,
+                "ssh_url": "",
+                "stargazers_count": 0,
+                "subscribers_count": 0,
+                "svn_url": "",
+                "updated_at": _timestamp(0),
+                "watchers_count": 0,
+            }
+        )
+        for template in ("branches_url", "commits_url", "contents_url", "pulls_url"):
+            data[template] = data[template] + "{/path}"
+        return data
+
+    def _pull_url(self, pr):
+        return f"{self.api}/repos/{pr['org']}/{pr['repo']}/pulls/{pr['number']}"
+
+    def _pull(self, pr):
+        url = self._pull_url(pr)
+        repo = self._repo(pr["org"], pr["repo"])
+        ref = lambda name, sha: {
+            "ref": name,
+            "label": f"{pr['org']}:{name}",
+            "sha": sha,
+            "user": self._user(pr["org"]),
+            "repo": repo,
+        }
+        return {
+            "url": url,
+            "id": pr["id"],
+            "number": pr["number"],
+            "html_url": f"{self.url}/{pr['org']}/{pr['repo']}/pull/{pr['number']}",
+            "issue_url": f"{self.api}/repos/{pr['org']}/{pr['repo']}/issues/{pr['number']}",
+            "diff_url": f"{url}.diff",
+            "patch_url": f"{url}.patch",
+            "comments_url": f"{url}/comments",
+            "commits_url": f"{url}/commits",
+            "review_comments_url": f"{url}/comments",
+            "review_comment_url": f"{url}/comments{{/number}}",
+            "statuses_url": f"{repo['url']}/statuses/{pr['sha']}",
+            "_links": {},
+            "active_lock_reason": None,
+            "assignee": None,
+            "assignees": [],
+            "base": ref(pr["base"], "0" * 40),
+            "head": ref(pr["head"], pr["sha"]),
+            "body": "",
+            "body_html": "",
+            "body_text": "",
+            "closed_at": None,
+            "created_at": _timestamp(0),
+            "locked": False,
+            "merge_commit_sha": None,
+            "merged_at": None,
+            "state": pr["state"],
+            "title": pr["title"],
+            "updated_at": pr["updated_at"],
+            "user": self._user(pr["author"]),
+            "additions": 1,
+            "author_association": "MEMBER",
+            "comments": 0,
+            "commits": 1,
+            "deletions": 1,
+            "draft": False,
+            "mergeable": pr["mergeable_state"] != "dirty",
+            "mergeable_state": pr["mergeable_state"],
+            "merged": pr["merged"],
+            "merged_by": None,
+            "review_comments": 0,
+            "requested_teams": [],
+            "requested_reviewers": [],
+            "milestone": None,
+            "labels": [],
+        }
+
+    def _issue(self, pr):
+        issue_url = f"{self.api}/repos/{pr['org']}/{pr['repo']}/issues/{pr['number']}"
+        return {
+            "id": pr["issue_id"],
+            "number": pr["number"],
+            "title": pr["title"],
+            "state": pr["state"],
+            "url": issue_url,
+            "repository_url": f"{self.api}/repos/{pr['org']}/{pr['repo']}",
+            "html_url": f"{self.url}/{pr['org']}/{pr['repo']}/pull/{pr['number']}",
+            "comments_url": f"{issue_url}/comments",
+            "events_url": f"{issue_url}/events",
+            "labels_url": f"{issue_url}/labels{{/name}}",
+            "pull_request": {"url": self._pull_url(pr)},
+            "assignee": None,
+            "assignees": [],
+            "body": "",
+            "closed_at": None,
+            "comments": 0,
+            "created_at": _timestamp(0),
+            "labels": [],
+            "locked": False,
+            "milestone": None,
+            "updated_at": pr["updated_at"],
+            "user": self._user(pr["author"]),
+            "score": 1.0,
+        }
+
+    def _comment(self, comment):
+        url = f"{self.api}/repos/{comment['org']}/{comment['repo']}/issues/comments/{comment['id']}"
+        return {
+            "id": comment["id"],
+            "url": url,
+            "body": comment["body"],
+            "body_text": comment["body"],
+            "user": self._user(comment["user"]),
+        }
+
+    def _notification(self, notif):
+        pr = self.pulls[(notif["org"], notif["repo"], notif["number"])]
+        comment = self.comments[notif["comment_id"]]
+        return {
+            "id": notif["id"],
+            "url": f"{self.api}/notifications/threads/{notif['id']}",
+            "reason": notif["reason"],
+            "unread": notif["unread"],
+            "updated_at": notif["updated_at"],
+            "last_read_at": None,
+            "subscription_url": f"{self.api}/notifications/threads/{notif['id']}/subscription",
+            "repository": self._repo(notif["org"], notif["repo"]),
+            "subject": {
+                "title": pr["title"],
+                "url": self._pull_url(pr),
+                "latest_comment_url": self._comment(comment)["url"],
+                "type": "PullRequest",
+            },
+        }
+
+    def _team(self, org, name):
+        team = self.orgs[org]["teams"][name]
+        url = f"{self.api}/teams/{team['id']}"
+        return {
+            "id": team["id"],
+            "name": name,
+            "slug": name,
+            "permission": "pull",
+            "url": url,
+            "members_url": f"{url}/members{{/member}}",
+            "repositories_url": f"{url}/repos",
+        }
+
+    def _org(self, org):
+        url = f"{self.api}/orgs/{org}"
+        return {
+            "id": self.orgs[org]["id"],
+            "login": org,
+            "url": url,
+            "avatar_url": "",
+            "created_at": _timestamp(0),
+            "description": "",
+            "events_url": f"{url}/events",
+            "followers": 0,
+            "following": 0,
+            "hooks_url": f"{url}/hooks",
+            "html_url": f"{self.url}/{org}",
+            "issues_url": f"{url}/issues",
+            "members_url": f"{url}/members{{/member}}",
+            "public_members_url": f"{url}/public_members{{/member}}",
+            "public_repos": 0,
+            "repos_url": f"{url}/repos",
+        }
+
+    def _branch(self, org, repo, name):
+        repo_url = f"{self.api}/repos/{org}/{repo}"
+        sha = self._resolve(org, repo, name)
+        contexts = self.repos[(org, repo)]["protected_contexts"]
+        return {
+            "name": name,
+            "commit": self._commit(org, repo, sha),
+            "_links": {},
+            "protected": name == "main",
+            "protection": {
+                "enabled": name == "main",
+                "required_status_checks": {
+                    "enforcement_level": "everyone" if name == "main" else "off",
+                    "contexts": contexts if name == "main" else [],
+                },
+            },
+            "protection_url": f"{repo_url}/branches/{name}/protection",
+        }
+
+    def _resolve(self, org, repo, ref):
+        """Resolve a branch name (or sha) to a commit sha"""
+        if ref == "main":
+            return "0" * 40
+        for pr in self.pulls.values():
+            if (pr["org"], pr["repo"]) == (org, repo) and ref in (pr["head"], pr["sha"]):
+                return pr["sha"]
+        return ref
+
+    def _commit(self, org, repo, sha):
+        url = f"{self.api}/repos/{org}/{repo}/commits/{sha}"
+        person = {"name": org, "email": "", "date": _timestamp(0)}
+        return {
+            "sha": sha,
+            "url": url,
+            "html_url": url,
+            "comments_url": f"{url}/comments",
+            "author": None,
+            "committer": None,
+            "parents": [],
+            "commit": {
+                "url": f"{self.api}/repos/{org}/{repo}/git/commits/{sha}",
+                "author": person,
+                "committer": person,
+                "message": "",
+                "tree": {"sha": sha, "url": ""},
+            },
+            "files": [],
+            "stats": {},
+        }
+
+    def _check_runs(self, org, repo, sha):
+        pr = next(
+            pr for pr in self.pulls.values() if (pr["org"], pr["repo"], pr["sha"]) == (org, repo, sha)
+        )
+        runs = []
+        for run in pr["check_runs"]:
+            runs.append(
+                {
+                    "id": run["id"],
+                    "name": run["name"],
+                    "status": run["status"],
+                    "conclusion": run["conclusion"],
+                    "head_sha": sha,
+                    "url": f"{self.api}/repos/{org}/{repo}/check-runs/{run['id']}",
+                    "html_url": "",
+                    "external_id": "",
+                    "started_at": _timestamp(0),
+                    "completed_at": None,
+                    "details_url": "",
+                    "check_suite": {"id": 1},
+                    "output": {"title": "", "summary": "", "text": "", "annotations_count": 0, "annotations_url": ""},
+                    "pull_requests": [],
+                    "app": {
+                        "id": 1,
+                        "name": "ci",
+                        "description": "",
+                        "external_url": "",
+                        "html_url": f"{self.url}/apps/ci",
+                        "created_at": _timestamp(0),
+                        "updated_at": _timestamp(0),
+                        "owner": self._user(org),
+                        "slug": "ci",
+                        "node_id": "",
+                    },
+                }
+            )
+        return {"total_count": len(runs), "check_runs": runs}
+
+    def _contents(self, org, repo, path):
+        content = self.repos[(org, repo)]["codeowners"]
+        url = f"{self.api}/repos/{org}/{repo}/contents/{path}"
+        return {
+            "type": "file",
+            "encoding": "base64",
+            "content": base64.b64encode(content.encode()).decode(),
+            "name": path,
+            "path": path,
+            "sha": hashlib.sha1(content.encode()).hexdigest(),
+            "size": len(content),
+            "url": url,
+            "git_url": url,
+            "html_url": url,
+            "download_url": url,
+            "_links": {},
+        }
+
+    # -- GraphQL -----------------------------------------------------------------
+
+    PULL_REQUEST_ALIAS = re.compile(
+        r'(\w+): repository\(owner: "([^"]+)", name: "([^"]+)"\) \{ pullRequest\(number: (\d+)\)'
+    )
+    CODEOWNERS_ALIAS = re.compile(
+        r'(\w+): repository\(owner: "([^"]+)", name: "([^"]+)"\) \{ codeowners:'
+    )
+
+    def graphql(self, query):
+        """Answer the batched queries GMB's GraphQL backend sends
+
+        Only understands the aliased `repository { pullRequest }` and
+        `repository { codeowners: object }` selections, and always returns every field.
+        """
+        data = {}
+        for alias, org, repo, number in self.PULL_REQUEST_ALIAS.findall(query):
+            pr = self.pulls.get((org, repo, int(number)))
+            data[alias] = {"pullRequest": self._pull_request_node(pr) if pr else None}
+        for alias, org, repo in self.CODEOWNERS_ALIAS.findall(query):
+            info = self.repos.get((org, repo))
+            data[alias] = {"codeowners": {"text": info["codeowners"]} if info else None}
+        return data
+
+    def _pull_request_node(self, pr):
+        page = lambda nodes: {"pageInfo": {"hasNextPage": False, "endCursor": None}, "nodes": nodes}
+        contexts = self.repos[(pr["org"], pr["repo"])]["protected_contexts"]
+        return {
+            "id": f"PR_{pr['id']}",
+            "databaseId": pr["id"],
+            "number": pr["number"],
+            "title": pr["title"],
+            "state": "MERGED" if pr["merged"] else pr["state"].upper(),
+            "merged": pr["merged"],
+            "mergeable": "CONFLICTING" if pr["mergeable_state"] == "dirty" else "MERGEABLE",
+            "mergeStateStatus": pr["mergeable_state"].upper(),
+            "url": f"{self.url}/{pr['org']}/{pr['repo']}/pull/{pr['number']}",
+            "updatedAt": pr["updated_at"],
+            "author": {"login": pr["author"]},
+            "baseRefName": pr["base"],
+            "headRefName": pr["head"],
+            "repository": {"name": pr["repo"], "owner": {"login": pr["org"]}},
+            "baseRef": {
+                "branchProtectionRule": {"requiredStatusCheckContexts": contexts}
+                if pr["base"] == "main"
+                else None
+            },
+            "reviews": page(
+                [{"author": {"login": review["user"]}, "state": review["state"]} for review in pr["reviews"]]
+            ),
+            "files": page([{"path": filename} for filename in pr["files"]]),
+            "commits": {
+                "nodes": [
+                    {
+                        "commit": {
+                            "checkSuites": {
+                                "nodes": [
+                                    {
+                                        "checkRuns": {
+                                            "nodes": [
+                                                {
+                                                    "name": run["name"],
+                                                    "status": run["status"].upper(),
+                                                    "conclusion": run["conclusion"].upper()
+                                                    if run["conclusion"]
+                                                    else None,
+                                                }
+                                                for run in pr["check_runs"]
+                                            ]
+                                        }
+                                    }
+                                ]
+                            }
+                        }
+                    }
+                ]
+            },
+        }
+
+    # -- query helpers -----------------------------------------------------------
+
+    def search(self, query):
+        terms = query.split()
+        results = []
+        for pr in self.pulls.values():
+            match = True
+            for term in terms:
+                key, _, value = term.partition(":")
+                if key == "is" and value == "open":
+                    match = pr["state"] == "open"
+                elif key == "involves":
+                    match = value in (pr["author"], *pr["mentions"]) or any(
+                        value in self.orgs[pr["org"]]["teams"][team.split("/")[1]]["members"]
+                        for team in pr["teams"]
+                    )
+                elif key == "mentions":
+                    match = value in pr["mentions"]
+                elif key == "team":
+                    match = value in pr["teams"]
+                elif key == "updated":
+                    match = _parse_timestamp(pr["updated_at"]) >= _parse_timestamp(
+                        value.lstrip(">=")
+                    )
+                if not match:
+                    break
+            if match:
+                results.append(pr)
+        return results
+
+
+class _Handler(http.server.BaseHTTPRequestHandler):
+    github = None
+    protocol_version = "HTTP/1.1"
+    # Buffer responses so headers and body go out in a single write
+    wbufsize = -1
+
+    ROUTES = (
+        ("search", re.compile(r"^/search/issues$")),
+        ("pull", re.compile(r"^/repos/(?P<org>[^/]+)/(?P<repo>[^/]+)/pulls/(?P<number>\d+)$")),
+        ("reviews", re.compile(r"^/repos/(?P<org>[^/]+)/(?P<repo>[^/]+)/pulls/(?P<number>\d+)/reviews$")),
+        ("files", re.compile(r"^/repos/(?P<org>[^/]+)/(?P<repo>[^/]+)/pulls/(?P<number>\d+)/files$")),
+        ("repo", re.compile(r"^/repos/(?P<org>[^/]+)/(?P<repo>[^/]+)$")),
+        ("branch", re.compile(r"^/repos/(?P<org>[^/]+)/(?P<repo>[^/]+)/branches/(?P<name>.+)$")),
+        ("commit", re.compile(r"^/repos/(?P<org>[^/]+)/(?P<repo>[^/]+)/commits/(?P<sha>[^/]+)$")),
+        ("check_runs", re.compile(r"^/repos/(?P<org>[^/]+)/(?P<repo>[^/]+)/commits/(?P<sha>\w+)/check-runs$")),
+        ("contents", re.compile(r"^/repos/(?P<org>[^/]+)/(?P<repo>[^/]+)/contents/(?P<path>.+)$")),
+        ("comment", re.compile(r"^/repos/(?P<org>[^/]+)/(?P<repo>[^/]+)/issues/comments/(?P<id>\d+)$")),
+        ("org", re.compile(r"^/orgs/(?P<org>[^/]+)$")),
+        ("teams", re.compile(r"^/orgs/(?P<org>[^/]+)/teams$")),
+        ("members", re.compile(r"^/teams/(?P<id>\d+)/members$")),
+        ("notifications", re.compile(r"^/notifications$")),
+        ("thread", re.compile(r"^/notifications/threads/(?P<id>\d+)$")),
+        ("rate_limit", re.compile(r"^/rate_limit$")),
+    )
+
+    def log_message(self, format, *args):
+        pass
+
+    def _route(self):
+        parsed = urlparse(self.path)
+        path = parsed.path
+        if path.startswith("/api/v3"):
+            path = path[len("/api/v3") :]
+        params = {k: v[-1] for k, v in parse_qs(parsed.query).items()}
+        for name, pattern in self.ROUTES:
+            match = pattern.match(path)
+            if match:
+                return name, match.groupdict(), params
+        return None, {}, params
+
+    def _send(self, status, body=None, headers=None):
+        if self.github.latency:
+            time.sleep(self.github.latency)
+        payload = b"" if body is None else json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        # like GitHub, on every response, counting down as requests are served
+        with self.github.lock:
+            remaining = max(RATE_LIMIT - sum(self.github.requests.values()), 0)
+        self.send_header("X-RateLimit-Limit", str(RATE_LIMIT))
+        self.send_header("X-RateLimit-Remaining", str(remaining))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _send_cached(self, body, headers=None):
+        headers = dict(headers or {})
+        etag = '"{}"'.format(hashlib.md5(json.dumps(body, sort_keys=True).encode()).hexdigest())
+        headers["ETag"] = etag
+        if self.headers.get("If-None-Match") == etag:
+            return self._send(304, headers=headers)
+        return self._send(200, body, headers)
+
+    def _paginate(self, items, params, name):
+        per_page = int(params.get("per_page", 30))
+        page = int(params.get("page", 1))
+        chunk = items[(page - 1) * per_page : page * per_page]
+        headers = {}
+        if page * per_page < len(items):
+            query = dict(params, page=page + 1, per_page=per_page)
+            next_url = "{}{}?{}".format(
+                self.github.url,
+                urlparse(self.path).path,
+                "&".join(f"{k}={v}" for k, v in query.items()),
+            )
+            headers["Link"] = f'<{next_url}>; rel="next"'
+        return chunk, headers
+
+    def do_GET(self):
+        github = self.github
+        name, args, params = self._route()
+        with github.lock:
+            github.requests[f"GET {name}"] += 1
+        if name is None:
+            return self._send(404, {"message": "Not Found"})
+        if name in github.failing:
+            return self._send(500, {"message": "Server Error"})
+        if "org" in args and "repo" in args and (args["org"], args["repo"]) not in github.repos:
+            return self._send(404, {"message": "Not Found"})
+        if name == "search":
+            hits = github.search(params.get("q", ""))
+            chunk, headers = self._paginate(hits, params, name)
+            body = {
+                "total_count": len(hits),
+                "incomplete_results": False,
+                "items": [github._issue(pr) for pr in chunk],
+            }
+            return self._send(200, body, headers)
+        if name in ("pull", "reviews", "files"):
+            pr = github.pulls.get((args["org"], args["repo"], int(args["number"])))
+            if pr is None:
+                return self._send(404, {"message": "Not Found"})
+            if name == "pull":
+                return self._send_cached(github._pull(pr))
+            if name == "reviews":
+                reviews = [
+                    {
+                        "id": review["id"],
+                        "user": github._user(review["user"]),
+                        "state": review["state"],
+                        "body": "",
+                        "body_html": "",
+                        "body_text": "",
+                        "html_url": "",
+                        "author_association": "MEMBER",
+                        "pull_request_url": github._pull_url(pr),
+                        "submitted_at": _timestamp(0),
+                        "commit_id": pr["sha"],
+                    }
+                    for review in pr["reviews"]
+                ]
+                chunk, headers = self._paginate(reviews, params, name)
+                return self._send_cached(chunk, headers)
+            files = [
+                {
+                    "sha": "0" * 40,
+                    "filename": filename,
+                    "status": "modified",
+                    "additions": 1,
+                    "deletions": 1,
+                    "changes": 2,
+                    "blob_url": "",
+                    "raw_url": "",
+                    "contents_url": "",
+                    "patch": "",
+                }
+                for filename in pr["files"]
+            ]
+            chunk, headers = self._paginate(files, params, name)
+            return self._send_cached(chunk, headers)
+        if name == "repo":
+            return self._send_cached(github._repo(args["org"], args["repo"]))
+        if name == "branch":
+            return self._send_cached(github._branch(args["org"], args["repo"], args["name"]))
+        if name == "commit":
+            sha = github._resolve(args["org"], args["repo"], args["sha"])
+            if "sha" in self.headers.get("Accept", ""):
+                payload = sha.encode()
+                self.send_response(200)
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                return self.wfile.write(payload)
+            args["sha"] = sha
+            return self._send_cached(github._commit(args["org"], args["repo"], args["sha"]))
+        if name == "check_runs":
+            return self._send_cached(github._check_runs(args["org"], args["repo"], args["sha"]))
+        if name == "contents":
+            return self._send_cached(github._contents(args["org"], args["repo"], args["path"]))
+        if name == "comment":
+            comment = github.comments.get(int(args["id"]))
+            if comment is None:
+                return self._send(404, {"message": "Not Found"})
+            return self._send_cached(github._comment(comment))
+        if name == "org":
+            if args["org"] not in github.orgs:
+                return self._send(404, {"message": "Not Found"})
+            return self._send_cached(github._org(args["org"]))
+        if name == "teams":
+            teams = [github._team(args["org"], team) for team in github.orgs[args["org"]]["teams"]]
+            chunk, headers = self._paginate(teams, params, name)
+            return self._send_cached(chunk, headers)
+        if name == "members":
+            team = next(
+                team
+                for org in github.orgs.values()
+                for team in org["teams"].values()
+                if team["id"] == int(args["id"])
+            )
+            members = [github._user(login) for login in team["members"]]
+            chunk, headers = self._paginate(members, params, name)
+            return self._send_cached(chunk, headers)
+        if name == "notifications":
+            headers = {"Last-Modified": github.notifications_modified, "X-Poll-Interval": "60"}
+            if self.headers.get("If-Modified-Since") == github.notifications_modified:
+                return self._send(304, headers=headers)
+            threads = [
+                github._notification(notif)
+                for notif in github.notifications.values()
+                if notif["unread"]
+            ]
+            chunk, page_headers = self._paginate(threads, params, name)
+            headers.update(page_headers)
+            return self._send(200, chunk, headers)
+        if name == "rate_limit":
+            resource = {"limit": 5000, "remaining": 4000, "reset": 2000000000, "used": 1000}
+            return self._send(
+                200,
+                {
+                    "resources": {"core": resource, "search": dict(resource, limit=30, remaining=25), "graphql": resource},
+                    "rate": resource,
+                },
+            )
+        return self._send(404, {"message": "Not Found"})
+
+    def do_POST(self):
+        github = self.github
+        length = int(self.headers.get("Content-Length") or 0)
+        body = json.loads(self.rfile.read(length) or b"{}")
+        path = urlparse(self.path).path
+        with github.lock:
+            github.requests["POST graphql"] += 1
+        if path not in ("/api/graphql", "/graphql"):
+            return self._send(404, {"message": "Not Found"})
+        return self._send(200, {"data": github.graphql(body.get("query", ""))})
+
+    def do_PATCH(self):
+        github = self.github
+        name, args, params = self._route()
+        with github.lock:
+            github.requests[f"PATCH {name}"] += 1
+        length = int(self.headers.get("Content-Length") or 0)
+        self.rfile.read(length)
+        if name == "thread" and args["id"] in github.notifications:
+            github.notifications[args["id"]]["unread"] = False
+            return self._send(205)
+        return self._send(404, {"message": "Not Found"})
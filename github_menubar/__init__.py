@@ -1,3 +1,14 @@
+import importlib
+
 from .config import CONFIG
-from .github_client import GitHubClient
-from .renderers import BitBarRenderer
+
+# The client and renderers import github3, ZODB and friends, which the BitBar plugin
+# usually doesn't need, so they are only imported on first use
+_LAZY_ATTRIBUTES = {"GitHubClient": "github_client", "BitBarRenderer": "renderers"}
+
+
+def __getattr__(name):
+    if name in _LAZY_ATTRIBUTES:
+        module = importlib.import_module(f".{_LAZY_ATTRIBUTES[name]}", __name__)
+        return getattr(module, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
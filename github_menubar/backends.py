@@ -0,0 +1,309 @@
+"""Backends that fetch pull request data from GitHub
+
+`GitHubClient` discovers pull requests with the search API and hands the search hits
+to a backend, which turns them into pull request objects and answers the per-PR
+questions (reviews, changed files, check runs, branch protection, CODEOWNERS) needed
+to parse them. `RestBackend` asks the REST API one question at a time;
+`GraphQLBackend` answers all of them for a batch of PRs with a single query.
+"""
+from concurrent.futures import ThreadPoolExecutor
+import logging
+from types import SimpleNamespace
+
+import arrow
+from github3.exceptions import ForbiddenError, NotFoundError, error_for
+
+GRAPHQL_PREVIEW = "application/vnd.github.merge-info-preview+json"
+
+PULL_REQUEST_FIELDS = """
+fragment PullRequestFields on PullRequest {
+  id
+  databaseId
+  number
+  title
+  state
+  merged
+  mergeable
+  mergeStateStatus
+  url
+  updatedAt
+  author { login }
+  baseRefName
+  headRefName
+  repository { name owner { login } }
+  baseRef {
+    branchProtectionRule { requiredStatusCheckContexts }
+  }
+  reviews(first: 100) {
+    pageInfo { hasNextPage endCursor }
+    nodes { author { login } state }
+  }
+  files(first: 100) {
+    pageInfo { hasNextPage endCursor }
+    nodes { path }
+  }
+  commits(last: 1) {
+    nodes {
+      commit {
+        checkSuites(first: 50) {
+          nodes { checkRuns(first: 100) { nodes { name status conclusion } } }
+        }
+      }
+    }
+  }
+}
+"""
+
+REVIEWS_PAGE = """
+query($id: ID!, $after: String) {
+  node(id: $id) {
+    ... on PullRequest {
+      reviews(first: 100, after: $after) {
+        pageInfo { hasNextPage endCursor }
+        nodes { author { login } state }
+      }
+    }
+  }
+}
+"""
+
+FILES_PAGE = """
+query($id: ID!, $after: String) {
+  node(id: $id) {
+    ... on PullRequest {
+      files(first: 100, after: $after) {
+        pageInfo { hasNextPage endCursor }
+        nodes { path }
+      }
+    }
+  }
+}
+"""
+
+
+def pull_request_ref(issue):
+    """(owner, repo, number) for a pull request search hit"""
+    owner, repo = issue.issue.repository_url.rsplit("/", 2)[-2:]
+    return owner, repo, issue.issue.number
+
+
+def graphql_url(api_url):
+    """The GraphQL endpoint that belongs to a REST API base URL"""
+    if api_url.endswith("/api/v3"):
+        return api_url[: -len("v3")] + "graphql"
+    return f"{api_url}/graphql"
+
+
+class RestBackend:
+    """Fetches pull request data with individual REST calls through github3
+
+    Pull requests are fetched `workers` at a time.
+    """
+
+    def __init__(self, client, workers=1):
+        self._client = client
+        self.workers = workers
+
+    def stream(self, refs):
+        """Pull requests for (owner, repo, number) refs, in order, as they are fetched;
+        None for any that are missing"""
+        if self.workers <= 1 or len(refs) <= 1:
+            for ref in refs:
+                yield self.pull_request(*ref)
+            return
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            yield from executor.map(lambda ref: self.pull_request(*ref), refs)
+
+    def fetch(self, refs):
+        """Pull requests for (owner, repo, number) refs; None for any that are missing"""
+        return list(self.stream(refs))
+
+    def pull_request(self, owner, repo, number):
+        """The pull request, or None if it is gone or we can no longer see it"""
+        try:
+            return self._client.pull_request(owner, repo, number)
+        except (NotFoundError, ForbiddenError):
+            return None
+
+    def _full_repo(self, pull_request):
+        short_repo = pull_request.repository
+        return self._client.repository(short_repo.owner.login, short_repo.name)
+
+    def protection(self, pull_request):
+        full_repo = self._full_repo(pull_request)
+        return full_repo.branch(pull_request.base.ref).original_protection
+
+    def codeowners(self, pull_request):
+        """Contents of the repo's CODEOWNERS file, or None if it can't be read"""
+        try:
+            codeowner_file = pull_request.repository.file_contents("CODEOWNERS")
+            return codeowner_file.decoded.decode()
+        except (NotFoundError, ForbiddenError):
+            return None
+
+    def reviews(self, pull_request):
+        """(login, state) for each review, oldest first"""
+        return [(review.user.login, review.state) for review in pull_request.reviews()]
+
+    def filenames(self, pull_request):
+        return [file.filename for file in pull_request.files()]
+
+    def check_runs(self, pull_request):
+        """(name, status, conclusion) for each check run on the head commit"""
+        repo = self._full_repo(pull_request)
+        commit = repo.commit(repo.branch(pull_request.head.ref).latest_sha())
+        return [
+            (check.name, check.status, check.conclusion)
+            for check in commit.check_runs()
+        ]
+
+
+class GraphQLPullRequest:
+    """A pull request fetched over GraphQL
+
+    Exposes the attributes of a github3 `PullRequest` that GMB reads, plus everything
+    the backend needs to answer per-PR questions without further requests.
+    """
+
+    def __init__(self, node, api_url):
+        owner = node["repository"]["owner"]["login"]
+        name = node["repository"]["name"]
+        self.node_id = node["id"]
+        self.id = node["databaseId"]
+        self.number = node["number"]
+        self.title = node["title"]
+        self.merged = node["merged"]
+        self.state = "closed" if node["state"] == "MERGED" else node["state"].lower()
+        self.mergeable = {"MERGEABLE": True, "CONFLICTING": False}.get(node["mergeable"])
+        self.mergeable_state = node["mergeStateStatus"].lower()
+        self.url = f"{api_url}/repos/{owner}/{name}/pulls/{self.number}"
+        self.html_url = node["url"]
+        self.updated_at = arrow.get(node["updatedAt"]).datetime
+        self.user = SimpleNamespace(login=(node["author"] or {}).get("login", "ghost"))
+        self.base = SimpleNamespace(ref=node["baseRefName"])
+        self.head = SimpleNamespace(ref=node["headRefName"])
+        self.repository = SimpleNamespace(name=name, owner=SimpleNamespace(login=owner))
+        rule = (node["baseRef"] or {}).get("branchProtectionRule")
+        self.protection = {
+            "enabled": rule is not None,
+            "required_status_checks": {
+                "contexts": rule["requiredStatusCheckContexts"] if rule else []
+            },
+        }
+        self.reviews = [
+            ((review["author"] or {}).get("login", "ghost"), review["state"])
+            for review in node["reviews"]["nodes"]
+        ]
+        self.filenames = [file["path"] for file in node["files"]["nodes"]]
+        self.check_runs = [
+            (run["name"], run["status"].lower(), (run["conclusion"] or "").lower() or None)
+            for commit in node["commits"]["nodes"]
+            for suite in commit["commit"]["checkSuites"]["nodes"]
+            for run in suite["checkRuns"]["nodes"]
+        ]
+        self.codeowners = None
+
+
+class GraphQLBackend:
+    """Fetches pull requests, and everything needed to parse them, in batched queries
+
+    Each page of `batch_size` pull requests costs a single GraphQL request, plus one
+    request per 100 extra reviews or files on unusually large PRs.
+    """
+
+    def __init__(self, client, url, batch_size=25):
+        self._session = client.session
+        self._api_url = client.session.base_url
+        self.url = url
+        self.batch_size = batch_size
+
+    def _query(self, query, variables=None):
+        response = self._session.post(
+            self.url,
+            json={"query": query, "variables": variables or {}},
+            headers={"Accept": GRAPHQL_PREVIEW},
+        )
+        if response.status_code >= 400:
+            raise error_for(response)
+        body = response.json()
+        for error in body.get("errors", ()):
+            logging.warning(f"GraphQL error: {error.get('message')}")
+        return body.get("data") or {}
+
+    def _page(self, query, connection, node_id, cursor):
+        items = []
+        while cursor:
+            data = self._query(query, {"id": node_id, "after": cursor})
+            page = data["node"][connection]
+            items.extend(page["nodes"])
+            cursor = page["pageInfo"]["hasNextPage"] and page["pageInfo"]["endCursor"]
+        return items
+
+    def _fetch(self, refs):
+        """Fetch a batch of (owner, repo, number) refs; missing PRs come back as None"""
+        aliases = []
+        repos = sorted({(owner, repo) for owner, repo, _ in refs})
+        for i, (owner, repo, number) in enumerate(refs):
+            aliases.append(
+                f"pr{i}: repository(owner: {_quote(owner)}, name: {_quote(repo)}) "
+                f"{{ pullRequest(number: {int(number)}) {{ ...PullRequestFields }} }}"
+            )
+        for i, (owner, repo) in enumerate(repos):
+            aliases.append(
+                f"repo{i}: repository(owner: {_quote(owner)}, name: {_quote(repo)}) "
+                '{ codeowners: object(expression: "HEAD:CODEOWNERS") { ... on Blob { text } } }'
+            )
+        data = self._query("query {\n%s\n}\n%s" % ("\n".join(aliases), PULL_REQUEST_FIELDS))
+        codeowners = {}
+        for i, repo in enumerate(repos):
+            blob = (data.get(f"repo{i}") or {}).get("codeowners")
+            codeowners[repo] = blob["text"] if blob else None
+        pull_requests = []
+        for i, ref in enumerate(refs):
+            node = (data.get(f"pr{i}") or {}).get("pullRequest")
+            if node is None:
+                logging.warning(f"Could not fetch pull request {ref}")
+                pull_requests.append(None)
+                continue
+            for connection, query in (("reviews", REVIEWS_PAGE), ("files", FILES_PAGE)):
+                page_info = node[connection]["pageInfo"]
+                if page_info["hasNextPage"]:
+                    node[connection]["nodes"].extend(
+                        self._page(query, connection, node["id"], page_info["endCursor"])
+                    )
+            pull_request = GraphQLPullRequest(node, self._api_url)
+            pull_request.codeowners = codeowners[ref[:2]]
+            pull_requests.append(pull_request)
+        return pull_requests
+
+    def stream(self, refs):
+        """Pull requests for (owner, repo, number) refs, in order, a batch at a time;
+        None for any that are missing"""
+        for start in range(0, len(refs), self.batch_size):
+            yield from self._fetch(refs[start : start + self.batch_size])
+
+    def fetch(self, refs):
+        """Pull requests for (owner, repo, number) refs; None for any that are missing"""
+        return list(self.stream(refs))
+
+    def pull_request(self, owner, repo, number):
+        return self.fetch([(owner, repo, number)])[0]
+
+    def protection(self, pull_request):
+        return pull_request.protection
+
+    def codeowners(self, pull_request):
+        return pull_request.codeowners
+
+    def reviews(self, pull_request):
+        return pull_request.reviews
+
+    def filenames(self, pull_request):
+        return pull_request.filenames
+
+    def check_runs(self, pull_request):
+        return pull_request.check_runs
+
+
+def _quote(value):
+    return '"{}"'.format(str(value).replace("\\", "\\\\").replace('"', '\\"'))
@@ -0,0 +1,50 @@
+import threading
+import time
+
+
+class TTLCache:
+    """Thread-safe cache whose entries expire `ttl` seconds after they were fetched
+
+    Keys are tuples, so related entries can be invalidated together by key prefix.
+    """
+
+    def __init__(self, ttl, clock=time.monotonic):
+        self.ttl = ttl
+        self._clock = clock
+        self._entries = {}
+        self._lock = threading.Lock()
+        self._key_locks = {}
+
+    def peek(self, key):
+        """The cached value for `key`, or None if it is missing or expired"""
+        entry = self._entries.get(key)
+        if entry is None or self._clock() - entry[1] > self.ttl:
+            return None
+        return entry[0]
+
+    def get(self, key, fetch):
+        """The cached value for `key`, calling `fetch` to (re)load it if needed
+
+        Concurrent callers asking for the same key wait for a single fetch.
+        """
+        value = self.peek(key)
+        if value is not None:
+            return value
+        with self._lock:
+            lock = self._key_locks.setdefault(key, threading.Lock())
+        with lock:
+            value = self.peek(key)
+            if value is None:
+                value = fetch()
+                self.put(key, value)
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = (value, self._clock())
+
+    def invalidate(self, *prefix):
+        """Drop all entries whose key starts with `prefix` (everything, if empty)"""
+        with self._lock:
+            for key in [key for key in self._entries if key[: len(prefix)] == prefix]:
+                del self._entries[key]
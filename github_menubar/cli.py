@@ -0,0 +1,52 @@
+"""The `gmb` command
+
+Without arguments, runs the GMB server. Everything else, apart from `config`, is sent
+to the running server over its control socket (see `github_menubar.control`), so a
+command only costs starting Python and one round trip to the server.
+"""
+import json
+import sys
+
+from github_menubar import control
+
+# command -> type of its argument, if it takes one
+COMMANDS = {
+    "open": int,
+    "clear": int,
+    "clearall": None,
+    "mute": int,
+    "unmute": int,
+    "refresh": None,
+    "state": None,
+}
+
+
+def main():
+    if len(sys.argv) == 1:
+        from github_menubar.github_client import GitHubClient
+
+        GitHubClient.run_server()
+        return
+    command = sys.argv[1]
+    if command == "config":
+        from github_menubar.utils import update_config
+
+        update_config(sys.argv[2], sys.argv[3])
+        return
+    if command not in COMMANDS:
+        sys.exit(f"Unknown command {command}, expected one of: config, {', '.join(COMMANDS)}")
+    args = [COMMANDS[command](sys.argv[2])] if COMMANDS[command] else []
+    try:
+        result = control.send(command, *args)
+    except TimeoutError:
+        sys.exit(f"The GMB server didn't respond to {command}")
+    except OSError:
+        sys.exit("The GMB server isn't running")
+    except control.CommandError as e:
+        sys.exit(f"{command} failed: {e}")
+    if command == "open":
+        import webbrowser
+
+        webbrowser.open(result)
+    elif command == "state":
+        print(json.dumps(result, indent=2, sort_keys=True))
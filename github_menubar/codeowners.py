@@ -0,0 +1,139 @@
+"""CODEOWNERS parsing and matching
+
+Patterns follow the gitignore-style rules GitHub uses for CODEOWNERS files:
+
+ - a pattern with a slash at its start or middle is relative to the repo root,
+   otherwise it matches at any depth
+ - a trailing slash matches a directory and everything beneath it
+ - `*` and `?` match within one path segment, `**` across segments
+ - the last matching rule wins
+"""
+import re
+
+
+def pattern_to_regex(pattern):
+    """Translate one CODEOWNERS pattern to a regex matching repo-relative paths"""
+    anchored = "/" in pattern.rstrip("/")
+    directory = pattern.endswith("/")
+    body = pattern.strip("/")
+    if body in ("", "**"):
+        return ".*"
+    regex = ""
+    i = 0
+    while i < len(body):
+        if body.startswith("**/", i):
+            regex += "(?:.*/)?"
+            i += 3
+        elif body.startswith("/**", i) and i + 3 == len(body):
+            regex += "/.*"
+            i += 3
+        elif body.startswith("**", i):
+            regex += ".*"
+            i += 2
+        elif body[i] == "*":
+            regex += "[^/]*"
+            i += 1
+        elif body[i] == "?":
+            regex += "[^/]"
+            i += 1
+        elif body[i] == "\\" and i + 1 < len(body):
+            regex += re.escape(body[i + 1])
+            i += 2
+        else:
+            regex += re.escape(body[i])
+            i += 1
+    prefix = "" if anchored else "(?:.*/)?"
+    if directory:
+        suffix = "/.*"
+    elif re.search(r"[*?][^/]*$", body.rsplit("/", 1)[-1]):
+        # "docs/*" owns the files directly in docs, not those further down
+        suffix = ""
+    else:
+        # a plain name matches a file, or a directory and everything in it
+        suffix = "(?:/.*)?"
+    return prefix + regex + suffix
+
+
+def _is_literal(segment):
+    # the empty segment of "/", which matches every path, can't be indexed by
+    return bool(segment) and not any(char in segment for char in "*?[\\")
+
+
+class CodeOwners:
+    """The rules of a CODEOWNERS file, compiled for matching many paths
+
+    Each rule is compiled to its own regex and indexed by a path segment that any
+    path it matches must contain: the first segment for rules anchored to the repo
+    root, or any segment for rules that match at any depth. Rules with no literal
+    segment to index by are checked for every path. A path is only tested against
+    the rules in its buckets, last rule first. Iterating yields the (pattern, owners)
+    rules, which is also all that gets pickled.
+    """
+
+    def __init__(self, rules):
+        self.rules = tuple((path, tuple(owners)) for path, owners in rules)
+        self._compiled = None
+
+    @classmethod
+    def parse(cls, file_contents):
+        rules = []
+        for line in file_contents.split("\n"):
+            line = line.strip()
+            if line and not line.startswith("#"):
+                # a pattern without owners leaves its files unowned
+                path, *owners = line.split(maxsplit=1)
+                owners = "".join(owners).split("#", 1)[0]
+                rules.append((path, tuple(sorted(owners.replace("@", "").split()))))
+        return cls(rules)
+
+    def __iter__(self):
+        return iter(self.rules)
+
+    def __len__(self):
+        return len(self.rules)
+
+    def __eq__(self, other):
+        return isinstance(other, CodeOwners) and self.rules == other.rules
+
+    def __hash__(self):
+        return hash(self.rules)
+
+    def __reduce__(self):
+        return (CodeOwners, (self.rules,))
+
+    def _compile(self):
+        """The (root, anywhere, unindexed, regexes) indexes of the rules
+
+        Built in locals and assigned all at once, since the same rules are matched
+        from several worker threads: at worst two threads compile them both.
+        """
+        root = {}
+        anywhere = {}
+        unindexed = []
+        for index, (path, _) in enumerate(self.rules):
+            segments = path.strip("/").split("/")
+            anchored = "/" in path.rstrip("/")
+            if anchored and segments[0] != "**" and _is_literal(segments[0]):
+                root.setdefault(segments[0], []).append(index)
+            elif not anchored and _is_literal(segments[0]):
+                anywhere.setdefault(segments[0], []).append(index)
+            elif segments[0] == "**" and len(segments) > 1 and _is_literal(segments[1]):
+                anywhere.setdefault(segments[1], []).append(index)
+            else:
+                unindexed.append(index)
+        regexes = [re.compile(pattern_to_regex(path)) for path, _ in self.rules]
+        self._compiled = (root, anywhere, unindexed, regexes)
+        return self._compiled
+
+    def owners(self, filename):
+        """Owners of a repo-relative path, or None if no rule matches it"""
+        root, anywhere, unindexed, regexes = self._compiled or self._compile()
+        filename = filename.lstrip("/")
+        segments = filename.split("/")
+        candidates = root.get(segments[0], []) + unindexed
+        for segment in set(segments):
+            candidates += anywhere.get(segment, ())
+        for index in sorted(candidates, reverse=True):
+            if regexes[index].fullmatch(filename):
+                return self.rules[index][1]
+        return None
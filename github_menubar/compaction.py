@@ -0,0 +1,121 @@
+"""Scheduled packing of the GMB database
+
+Packing rewrites the whole FileStorage, so rather than packing after every update the
+server checks a `CompactionPolicy` from its own scheduler job and only packs once the
+database has grown by `pack_growth_mb` or `pack_interval` seconds have passed since the
+last pack. Clients reading state hold a shared lock on `readers.lock` for the duration
+of the read; a pack that finds the lock held is put off until the next check.
+"""
+from contextlib import contextmanager
+import fcntl
+import json
+import logging
+import os
+import time
+
+from github_menubar.config import CONFIG
+
+READERS_LOCK = os.path.join(CONFIG["base_dir"], "readers.lock")
+
+
+@contextmanager
+def reading(path=READERS_LOCK):
+    """Mark a read of the database as active, for as long as the context is open
+
+    Never waits: if a pack is already running the read just goes ahead unmarked.
+    """
+    try:
+        lock_file = open(path, "a")
+    except OSError:
+        yield
+        return
+    with lock_file:
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_SH | fcntl.LOCK_NB)
+        except OSError:
+            pass
+        yield
+
+
+class CompactionPolicy:
+    """Decides when to pack the database at `path`, and packs it"""
+
+    def __init__(
+        self,
+        db,
+        path,
+        growth_bytes,
+        max_age,
+        state_path=None,
+        lock_path=READERS_LOCK,
+        clock=time.time,
+    ):
+        self.db = db
+        self.path = path
+        self.growth_bytes = growth_bytes
+        self.max_age = max_age
+        self.state_path = state_path or f"{path}.pack.json"
+        self.lock_path = lock_path
+        self._clock = clock
+        # the result of the most recent pack
+        self.last_result = None
+        try:
+            with open(self.state_path) as fi:
+                state = json.load(fi)
+        except (OSError, ValueError):
+            # nothing to go on; start counting from now
+            state = {"packed_at": self._clock(), "size": self._size()}
+        self.packed_at = state["packed_at"]
+        self.packed_size = state["size"]
+
+    def _size(self):
+        try:
+            return os.path.getsize(self.path)
+        except OSError:
+            return 0
+
+    def due(self):
+        """Why the database should be packed now, or None if it shouldn't"""
+        growth = self._size() - self.packed_size
+        if self.growth_bytes and growth >= self.growth_bytes:
+            return f"grew by {growth} bytes"
+        age = self._clock() - self.packed_at
+        if self.max_age and age >= self.max_age:
+            return f"last packed {age:.0f}s ago"
+        return None
+
+    def run(self):
+        """Pack the database if it is due and no reads are active
+
+        Returns the bytes reclaimed and the duration of the pack, or None if it didn't
+        pack.
+        """
+        reason = self.due()
+        if reason is None:
+            return None
+        with open(self.lock_path, "a") as lock_file:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                logging.info("Skipping database pack while state is being read")
+                return None
+            logging.info(f"Packing database: {reason}")
+            size = self._size()
+            start = time.time()
+            self.db.pack()
+            duration = time.time() - start
+        self.packed_at = self._clock()
+        self.packed_size = self._size()
+        self.last_result = {
+            "bytes_reclaimed": size - self.packed_size,
+            "duration": duration,
+        }
+        logging.info(
+            f"Packed database in {duration:.2f}s, "
+            f"reclaimed {self.last_result['bytes_reclaimed']} bytes"
+        )
+        tmp_path = f"{self.state_path}.tmp"
+        with open(tmp_path, "w") as fo:
+            json.dump({"packed_at": self.packed_at, "size": self.packed_size}, fo)
+        os.replace(tmp_path, self.state_path)
+        return self.last_result
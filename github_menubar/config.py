@@ -70,6 +70,8 @@ team_mentions: true
 # If True, only show the GitHub logo in the menubar, without additional information. Useful if you
 # don't have much space in your MenuBar
 collapsed: false
+# Base URL of the GitHub API; for GitHub Enterprise, use the URL of your GitHub server
+api_url: https://api.github.com
 # Port on which to run the GMB server
 port: 9999
 # PR description format string
@@ -82,6 +84,58 @@ launch_on_startup: false
 #  Update interval in seconds for updating the gmb server state. Making this shorter than
 # the default is dangerous, as it could result in your GitHub account being rate-limited
 update_interval: 120
+#  Longest interval between updates. Updates are spaced out further than update_interval
+# when the requests the last update made would use up GitHub's rate limits before they
+# are reset, up to this many seconds
+max_update_interval: 1800
+#  Fraction of each GitHub rate limit to leave for other tools that use the same token
+rate_limit_reserve: 0.1
+#  Average number of requests per minute sent to GitHub, to stay clear of its secondary
+# rate limits; up to a minute's worth can be sent at once. 0 for no limit
+requests_per_minute: 600
+#  Number of pull requests whose details are fetched in parallel during an update. Set to 1
+# to fetch them one at a time
+enrichment_workers: 8
+#  Maximum number of requests in flight to any one API host
+per_host_concurrency: 8
+#  Size limit for the cache of GitHub responses that lets unchanged data be revalidated
+# without counting against the rate limit. Set to 0 to disable the cache
+http_cache_size_mb: 50
+#  Seconds to keep a branch's protection rules before fetching them again
+protection_ttl: 3600
+#  Seconds to keep an org's team list, or a team's members, before fetching them again
+team_ttl: 3600
+#  Number of PRs to store between database commits during an update. With 0, everything an
+# update changes is committed at once when it finishes
+commit_every: 0
+#  Seconds between full searches for the PRs you are involved in. In between, an update
+# only searches for PRs updated since the previous one, and keeps the rest as they are.
+# With 0, every update does a full search
+full_sweep_interval: 3600
+#  Seconds by which each search for updated PRs overlaps the previous one, to allow for
+# clock skew and GitHub's search index lagging behind
+search_overlap: 300
+#  PRs that weren't updated since the previous update are still refreshed on every update if
+# they are yours, or if their checks or mergeability are pending and they were updated in
+# the last hot_pr_age seconds; other PRs are refreshed every cold_refresh_cycles updates
+hot_pr_age: 86400
+cold_refresh_cycles: 5
+#  The database is packed once it has grown by this many MB since it was last packed, or
+# when pack_interval seconds have passed since then; set either to 0 to disable it
+pack_growth_mb: 20
+pack_interval: 86400
+#  Seconds between checks of whether the database should be packed
+pack_check_interval: 600
+#  Seconds the BitBar output pre-rendered by the server is shown for before the plugin renders
+# it itself; the server renders it again every half of this, also between updates
+snapshot_max_age: 300
+#  How PR details are fetched: "rest" makes several requests per PR, "graphql" fetches them
+# for many PRs at once with batched GraphQL queries
+fetch_backend: rest
+#  Number of PRs requested per GraphQL query
+graphql_batch_size: 25
+#  GraphQL endpoint; leave empty to use the one that belongs to api_url
+graphql_url: null
 #  Font specifications used by BitBar; Alternative fonts may or may not work, and are untested.
 font: "font='Hack Regular Nerd Font Complete' size=13"
 font_large: "font='Hack Regular Nerd Font Complete' size=14"
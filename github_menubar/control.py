@@ -0,0 +1,109 @@
+"""Control channel to the running GMB server
+
+The server listens on a Unix domain socket at `SOCKET_PATH` and handles commands
+from the `gmb` CLI with its own, already connected client. That way, muting a PR or
+clearing a notification doesn't need a new process to log in to GitHub and connect
+to the database. Each request and each response is one line of JSON:
+
+    {"command": "mute", "args": [123]}
+    {"ok": true, "result": null}
+"""
+import json
+import logging
+import os
+import socket
+import socketserver
+import threading
+
+from github_menubar.config import CONFIG
+
+SOCKET_PATH = os.path.join(CONFIG["base_dir"], "gmb.sock")
+
+
+class CommandError(Exception):
+    """The server couldn't carry out a command"""
+
+
+def _encode(value):
+    """JSON encoding for values in the GMB state that JSON doesn't handle"""
+    if isinstance(value, (set, frozenset)):
+        return sorted(value)
+    if hasattr(value, "isoformat"):
+        return value.isoformat()
+    # e.g. a `CodeOwners` matcher
+    return list(value)
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    def handle(self):
+        for line in self.rfile:
+            response = self.server.control.execute(line)
+            self.wfile.write(json.dumps(response, default=_encode).encode() + b"\n")
+
+
+class _Server(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+class ControlServer:
+    """Serves `commands`, a mapping of command names to functions, on `path`"""
+
+    def __init__(self, commands, path=SOCKET_PATH):
+        self.commands = commands
+        self.path = path
+        self._server = None
+
+    def start(self):
+        """Listen for commands in a background thread"""
+        # a socket left behind by a server that didn't shut down cleanly
+        if os.path.exists(self.path):
+            os.remove(self.path)
+        # created owner-only, so there's no window in which others can connect
+        umask = os.umask(0o077)
+        try:
+            self._server = _Server(self.path, _Handler)
+        finally:
+            os.umask(umask)
+        self._server.control = self
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        logging.info(f"Listening for commands on {self.path}")
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+            os.remove(self.path)
+
+    def execute(self, line):
+        """Run the command in one request line, and return the response"""
+        try:
+            request = json.loads(line)
+            command = self.commands[request["command"]]
+        except (ValueError, KeyError, TypeError):
+            return {"ok": False, "error": f"Invalid request: {line.strip()!r}"}
+        try:
+            return {"ok": True, "result": command(*request.get("args", ()))}
+        except Exception as e:
+            logging.exception(f"Command {request['command']} failed")
+            return {"ok": False, "error": f"{type(e).__name__}: {e}"}
+
+
+def send(command, *args, path=SOCKET_PATH, timeout=30):
+    """Send a command to the server and return its result
+
+    Raises `OSError` (usually `FileNotFoundError` or `ConnectionRefusedError`) if the
+    server isn't listening, and `CommandError` if the command failed.
+    """
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.settimeout(timeout)
+        sock.connect(path)
+        sock.sendall(json.dumps({"command": command, "args": args}).encode() + b"\n")
+        with sock.makefile("rb") as fi:
+            line = fi.readline()
+    if not line:
+        raise CommandError(f"The server closed the connection during {command}")
+    response = json.loads(line)
+    if not response["ok"]:
+        raise CommandError(response["error"])
+    return response["result"]
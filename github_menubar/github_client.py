@@ -1,48 +1,102 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
 import datetime
 import json
 import logging
 import os
-import sys
+import threading
 import time
 import webbrowser
+import zlib
 
-from apscheduler.schedulers.background import BackgroundScheduler
 import arrow
 import github3
 from github3.exceptions import ForbiddenError, NotFoundError
-import psutil
-import pync
-import ZEO
 from ZEO.ClientStorage import ClientStorage
 from ZODB import DB
 
-# from ZODB.PersistentMapping import PersistentMapping
-
+from github_menubar.backends import (
+    GraphQLBackend,
+    graphql_url,
+    pull_request_ref,
+    RestBackend,
+)
+from github_menubar.caches import TTLCache
+from github_menubar.codeowners import CodeOwners
+from github_menubar.compaction import CompactionPolicy
 from github_menubar.config import CONFIG
-from github_menubar.utils import load_config, update_config
+from github_menubar.control import ControlServer
+from github_menubar.pipeline import consume, feed, iterate_in_thread, run_stages
+from github_menubar.ratelimit import plan_interval, RateLimited, RateLimiter, RESOURCES
+from github_menubar.session import limit_concurrency, ResponseCache
+from github_menubar.snapshot import remove_snapshot, write_snapshot
+from github_menubar.state import StateReader
+from github_menubar.storage import init_root, SETS, StagedChanges, UnitOfWork
+from github_menubar.teams import TeamIndex
+from github_menubar.utils import load_config
 
 
-class GitHubClient:
+class GitHubClient(StateReader):
     def __init__(self) -> None:
         """Initialize the GitHub client and load state from db"""
+        self._config_mtime = os.path.getmtime(CONFIG["config_file_path"])
         self.CONFIG = load_config()
         self.storage = ClientStorage(self.CONFIG["port"])
         self.db = DB(self.storage)
-        self._client = github3.login(token=self.CONFIG["token"])
+        if self.CONFIG["api_url"] == "https://api.github.com":
+            self._client = github3.login(token=self.CONFIG["token"])
+        else:
+            self._client = github3.enterprise_login(
+                url=self.CONFIG["api_url"], token=self.CONFIG["token"]
+            )
+        if self.CONFIG["enrichment_workers"] > 1:
+            limit_concurrency(
+                self._client.session,
+                self.CONFIG["per_host_concurrency"],
+                self.CONFIG["enrichment_workers"],
+            )
+        # installed before the response cache, so it only sees requests sent to GitHub
+        self.rate_limiter = RateLimiter(self.CONFIG["requests_per_minute"])
+        self.rate_limiter.install(self._client.session)
+        self._cache = ResponseCache(
+            os.path.join(CONFIG["base_dir"], "http_cache.pickle"),
+            self.CONFIG["http_cache_size_mb"] * 2 ** 20,
+        )
+        if self.CONFIG["http_cache_size_mb"]:
+            self._cache.install(self._client.session)
+        if self.CONFIG["fetch_backend"] == "graphql":
+            self._backend = GraphQLBackend(
+                self._client,
+                self.CONFIG["graphql_url"] or graphql_url(self._client.session.base_url),
+                self.CONFIG["graphql_batch_size"],
+            )
+        else:
+            self._backend = RestBackend(self._client, self.CONFIG["enrichment_workers"])
+        # branch protection, keyed by (owner, repo, branch)
+        self.protection = TTLCache(self.CONFIG["protection_ttl"])
+        # compiled CODEOWNERS matchers, keyed by repo
+        self._codeowners = {}
+        self._fetch_lock = threading.Lock()
+        # metrics for the most recent update
+        self.metrics = {}
+        # the most recent discovery that was committed; see `_search_since`
+        self._discovery = None
+        # number of updates run, for refreshing cold PRs every few updates
+        self._cycle = 0
+        # the most recent notifications poll that was committed
+        self._notification_poll = None
+        # when the next update should run; see `_plan_schedule`
+        self.schedule = None
         self._init_db()
 
     def _init_db(self):
         with self.db.transaction() as conn:
-            try:
-                conn.root.pull_requests
-            except AttributeError:
-                conn.root.pull_requests = {}  # PersistentMapping()
-                conn.root.notifications = {}  # PersistentMapping()
-                conn.root.codeowners = {}  # PersistentMapping()
-                conn.root.team_members = {}  # PersistentMapping()
-                conn.root.mentioned = set()
-                conn.root.team_mentioned = set()
-                conn.root.last_update = None
+            if init_root(conn.root):
+                logging.info("Initialized database")
+            self.teams = TeamIndex()
+            for teams in conn.root.team_members.values():
+                for team, members in (teams or {}).items():
+                    self.teams.update(team, members)
 
     @classmethod
     def run_server(cls) -> None:
@@ -51,6 +105,11 @@ class GitHubClient:
         Spins up the ZEO database server and a background scheduler to update state
         at the configured interval. Throws an exception if the server is already running.
         """
+        # only the server needs these, so they aren't imported with the module
+        from apscheduler.schedulers.background import BackgroundScheduler
+        import psutil
+        import ZEO
+
         if os.path.exists(CONFIG["pid_file"]):
             with open(CONFIG["pid_file"], "r") as fi:
                 pid = int(fi.read().strip())
@@ -62,90 +121,70 @@ class GitHubClient:
         config = load_config()
         ZEO.server(path=CONFIG["db_location"], port=config["port"])
         client = cls()
+        compaction = CompactionPolicy(
+            client.db,
+            CONFIG["db_location"],
+            config["pack_growth_mb"] * 2 ** 20,
+            config["pack_interval"],
+        )
         sched = BackgroundScheduler(daemon=True)
-        sched.add_job(
-            client.update,
+
+        def update():
+            try:
+                client.update()
+            except RateLimited as e:
+                logging.warning(f"Update stopped: {e}")
+                client.defer_update(e.until)
+            # replaces the run the interval trigger scheduled
+            update_job.modify(next_run_time=client.schedule["next_run"].datetime)
+
+        update_job = sched.add_job(
+            update,
             "interval",
             seconds=config["update_interval"],
             next_run_time=datetime.datetime.now(),
         )
+        # packing runs as its own job, so it never holds up an update
+        sched.add_job(compaction.run, "interval", seconds=config["pack_check_interval"])
+        # updates can be spaced further apart than the snapshot lasts, to stay within
+        # the rate limits, so it is rendered again in between
+        sched.add_job(
+            client.render_snapshot,
+            "interval",
+            seconds=max(config["snapshot_max_age"] / 2, 1),
+        )
         sched.start()
+
+        def open_notification(notif_id):
+            # the CLI opens the URL itself, in the user's session
+            return client.open_notification(notif_id, browse=False)
+
+        def refresh():
+            # a forced refresh shouldn't show branch protection up to protection_ttl old
+            client.protection.invalidate()
+            # runs the scheduled update now, unless one is already running
+            update_job.modify(next_run_time=datetime.datetime.now())
+
+        control = ControlServer(
+            {
+                "open": open_notification,
+                "clear": client.clear_notification,
+                "clearall": client.clear_all_notifications,
+                "mute": client.mute_pr,
+                "unmute": client.unmute_pr,
+                "refresh": refresh,
+                "state": client.get_state,
+            }
+        )
+        control.start()
         logging.info("server running")
         try:
             while True:
                 time.sleep(2)
         except (KeyboardInterrupt, SystemExit):
+            control.stop()
             sched.shutdown()
 
-    def get_state(self, complete=False):
-        """Get a dictionary specifying the current database state
-
-        By default, excludes the following:
-         - muted PRs and associated notifications
-         - cleared notifications
-         - PRs and associated notifications to be excluded based on the `mentions_only`
-           and/or `team_mentions` flags
-        If `complete` is True, this will return all notifications/PRs.
-
-        Args:
-            complete: If True, return all data, ignoring the `mentions_only and
-                `team_mentions` flags
-        Returns:
-            A dictionary of the complete database state, with the following keys:
-            {
-                "notifications":
-                "pull_requests":
-                "codeowners":
-                "team_members":
-                "last_update":
-                "mentioned":
-                "team_mentioned":
-            }
-
-        """
-        mentions_only = False if complete else self.CONFIG["mentions_only"]
-        with self.db.transaction() as conn:
-            pull_requests = conn.root.pull_requests
-            notifications = conn.root.notifications
-            if mentions_only:
-                pull_requests = {
-                    pr_id: pr
-                    for pr_id, pr in pull_requests.items()
-                    if (pr_id in conn.root.mentioned)
-                    or (pr["author"] == self.CONFIG["user"])
-                    or (
-                        self.CONFIG["team_mentions"]
-                        and pr_id in conn.root.team_mentioned
-                    )
-                }
-                notifications = {
-                    notif_id: notif
-                    for notif_id, notif in notifications.items()
-                    if notif.get("pr_id") in conn.root.mentioned
-                    or pull_requests.get(notif.get("pr_id"), {}).get("author")
-                    == self.CONFIG["user"]
-                }
-            if not complete:
-                pull_requests = {
-                    pr_id: pr for pr_id, pr in pull_requests.items() if not pr["muted"]
-                }
-                notifications = {
-                    notif_id: notif
-                    for notif_id, notif in notifications.items()
-                    if not pull_requests.get(notif.get("pr_id"), {}).get("muted")
-                    and not notif["cleared"]
-                }
-
-            return {
-                "notifications": notifications,
-                "pull_requests": pull_requests,
-                "codeowners": conn.root.codeowners,
-                "team_members": conn.root.team_members,
-                "last_update": conn.root.last_update,
-                "mentioned": conn.root.mentioned,
-                "team_mentioned": conn.root.team_mentioned,
-            }
-
     def _transform_pr_url(self, api_url):
         """Transform a pull request API URL to a browser URL"""
         return api_url.replace("api.github.com/repos", "github.com").replace(
@@ -156,193 +195,664 @@ class GitHubClient:
         """Get rate limit information from the github3 client"""
         return self._client.rate_limit()
 
-    def get_muted_prs(self) -> dict:
-        """Retrieve information on all PRs the user has muted"""
+    def _plan_schedule(self):
+        """When to run the next update, to make the rate limits last until they reset
+
+        Assumes the next update makes as many requests as the one that just ran.
+        """
+        try:
+            resources = self.rate_limit()["resources"]
+        except NotFoundError:
+            # GitHub Enterprise with rate limiting disabled
+            resources = {}
+        budgets = {name: resources[name] for name in RESOURCES if name in resources}
+        interval = plan_interval(
+            budgets,
+            self.rate_limiter.counts,
+            self.CONFIG["update_interval"],
+            self.CONFIG["max_update_interval"],
+            self.CONFIG["rate_limit_reserve"],
+        )
+        if interval > self.CONFIG["update_interval"]:
+            logging.info(f"Spacing updates {interval:.0f}s apart to stay within rate limits")
+        return {
+            "next_run": arrow.now().shift(seconds=interval),
+            "interval": interval,
+            "budgets": budgets,
+            "used": dict(self.rate_limiter.counts),
+        }
+
+    def defer_update(self, until):
+        """Put the next update off until `until`, after GitHub rate limited this one"""
+        self.schedule = dict(
+            self.schedule or {"budgets": {}, "used": {}},
+            next_run=arrow.get(until),
+            interval=until - time.time(),
+        )
         with self.db.transaction() as conn:
-            return [pr for pr in conn.root.pull_requests.values() if pr["muted"]]
+            conn.root.schedule = self.schedule
+        self.render_snapshot()
 
     def mute_pr(self, id_) -> None:
         """Mute a PR"""
         with self.db.transaction() as conn:
-            pull_requests = conn.root.pull_requests
-            pull_requests[id_]["muted"] = True
-            conn.root.pull_requests = pull_requests
+            conn.root.pull_requests[id_]["muted"] = True
+        self.render_snapshot()
 
     def unmute_pr(self, id_):
         """Unmute a PR"""
         with self.db.transaction() as conn:
-            pull_requests = conn.root.pull_requests
-            pull_requests[id_]["muted"] = False
-            conn.root.pull_requests = pull_requests
+            conn.root.pull_requests[id_]["muted"] = False
+        self.render_snapshot()
 
     def clear_notification(self, notif_id):
         with self.db.transaction() as conn:
-            notifications = conn.root.notifications
-            notifications[notif_id]["cleared"] = True
-            conn.root.notifications = notifications
+            conn.root.notifications[notif_id]["cleared"] = True
+        self.render_snapshot()
 
     def clear_all_notifications(self):
         with self.db.transaction() as conn:
-            notifications = conn.root.notifications
-            for notif_id, notif in notifications.items():
-                notifications[notif_id]["cleared"] = True
-            conn.root.notifications = notifications
+            for notif in conn.root.notifications.values():
+                if not notif["cleared"]:
+                    notif["cleared"] = True
+        self.render_snapshot()
+
+    def render_snapshot(self):
+        """Write the BitBar output for the current state to the snapshot file
+
+        If it can't be rendered, the old snapshot is removed so the plugin doesn't
+        show outdated state.
+        """
+        # imported here, since the renderers import this module
+        from github_menubar.renderers import BitBarRenderer
+
+        try:
+            # `get_state` filters with e.g. `mentions_only`, which may have been set
+            # since the server started
+            self._reload_config()
+            text = BitBarRenderer(client=self).render()
+            if os.path.getmtime(CONFIG["config_file_path"]) == self._config_mtime:
+                write_snapshot(text)
+            else:
+                # changed while rendering, so the plugin renders until the next one
+                remove_snapshot()
+        except Exception:
+            logging.exception("Could not render BitBar snapshot")
+            remove_snapshot()
+
+    def _reload_config(self):
+        """Load the config again if the config file changed since it was loaded"""
+        mtime = os.path.getmtime(CONFIG["config_file_path"])
+        if mtime != self._config_mtime:
+            self._config_mtime = mtime
+            self.CONFIG = load_config()
+            logging.info("Reloaded config")
 
-    def open_notification(self, notif_id):
+    def open_notification(self, notif_id, browse=True):
+        """Clear a notification and open its PR in the browser
+
+        Returns the PR's URL. With `browse=False` the URL isn't opened, e.g. when the
+        server handles the command for the CLI, which opens it itself.
+        """
         self.clear_notification(notif_id)
         with self.db.transaction() as conn:
-            webbrowser.open(conn.root.notifications[notif_id]["pr_url"])
+            url = conn.root.notifications[notif_id]["pr_url"]
+        if browse:
+            webbrowser.open(url)
+        return url
 
-    def get_pull_requests(self):
-        """Search for all pull_requests involving the user"""
-        with self.db.transaction() as conn:
-            user_teams = [
-                team
-                for repo, teams in conn.root.team_members.items()
-                for team, members in teams.items()
-                if self.CONFIG["user"] in members
-            ]
-        prs = []
-        issue_pr_map = {}
-        for issue in self._client.search_issues(
-            f"is:open is:pr involves:{self.CONFIG['user']} archived:false"
-        ):
-            pr = issue.issue.pull_request()
-            issue_pr_map[issue.id] = pr.id
-            prs.append(pr)
+    def _search_since(self, user_teams):
+        """Timestamp to search for updated PRs from, or None for a full search
 
-        for issue in self._client.search_issues(
-            f"is:open is:pr mentions:{self.CONFIG['user']} archived:false"
+        A full search is due every `full_sweep_interval` seconds, and whenever the
+        user's teams change, since the PRs of a new team wouldn't show up as updated.
+        """
+        interval = self.CONFIG["full_sweep_interval"]
+        previous = self._discovery
+        if (
+            not interval
+            or previous is None
+            or time.time() - previous["swept_at"] >= interval
+            or previous["teams"] != user_teams
         ):
-            with self.db.transaction() as conn:
-                mentioned = conn.root.mentioned
-                mentioned.add(issue_pr_map[issue.id])
-                conn.root.mentioned = mentioned
-        for team in user_teams:
-            for issue in self._client.search_issues(
-                f"is:open is:pr team:{team} archived:false"
-            ):
-                if issue.id not in issue_pr_map:
-                    pr = issue.issue.pull_request()
-                    prs.append(pr)
-                    issue_pr_map[issue.id] = pr.id
-                with self.db.transaction() as conn:
-                    team_mentioned = conn.root.team_mentioned
-                    team_mentioned.add(issue_pr_map[issue.id])
-                    conn.root.team_mentioned = team_mentioned
+            return None
+        since = arrow.get(previous["searched_at"] - self.CONFIG["search_overlap"])
+        return since.to("utc").format("YYYY-MM-DDTHH:mm:ssZZ")
+
+    def _search(self, qualifiers, since):
+        if since is None:
+            query = f"is:open is:pr {qualifiers} archived:false"
+        else:
+            # closed PRs too, so PRs closed since the last search can be dropped
+            query = f"is:pr {qualifiers} archived:false updated:>={since}"
+        return list(self._client.search_issues(query, per_page=100))
 
-        return prs
+    def _is_fresh(self, record, issue):
+        """Whether a search hit's stored PR can be kept as it is"""
+        return (
+            record is not None
+            and record["updated_at"] == arrow.get(issue.issue.updated_at)
+            and not self._refresh_due(record)
+        )
+
+    def get_pull_requests(self, since=None, staged=None):
+        """Search for all pull_requests involving the user
+
+        The searches run concurrently. Hits whose stored PR is up to date (see
+        `_is_fresh`) are kept as they are: they are only added to `self.current_prs`,
+        and to the mention sets, through `staged` if given. The (owner, repo, number)
+        refs of the rest, whose PRs need fetching, are returned, along with the refs
+        that belong in each mention set once their PRs are fetched. The ids of any
+        of those PRs already stored are collected in `self.stale_prs`. With `since`,
+        only searches for those updated since then. The API URLs of any closed PRs
+        that search turns up are collected in `self.closed_prs`.
+        """
+        if staged is None:
+            staged = self._uow
+        user = self.CONFIG["user"]
+        user_teams = sorted(self.teams.teams(user))
+        self.closed_prs = set()
+        self.stale_prs = set()
+        queries = [f"involves:{user}", f"mentions:{user}"]
+        queries += [f"team:{team}" for team in user_teams]
+        with ThreadPoolExecutor(max_workers=self.CONFIG["enrichment_workers"]) as executor:
+            involved, mentions, *team_hits = executor.map(
+                lambda query: self._search(query, since), queries
+            )
+
+        # each PR once, found by the involves search or else by a team search
+        hits = {}
+        for issue in involved + [issue for issues in team_hits for issue in issues]:
+            if issue.issue.state == "closed":
+                self.closed_prs.add(issue.issue.pull_request_urls["url"])
+            else:
+                hits.setdefault(issue.id, issue)
+        mention_hits = {
+            "mentioned": {issue.id for issue in mentions},
+            "team_mentioned": {issue.id for issues in team_hits for issue in issues},
+        }
+        stored = {record["url"]: record for record in self._uow["pull_requests"].values()}
+        fresh = {name: set() for name in mention_hits}
+        refs = []
+        mentioned_refs = {name: set() for name in mention_hits}
+        for issue in hits.values():
+            record = stored.get(issue.issue.pull_request_urls["url"])
+            is_fresh = self._is_fresh(record, issue)
+            if is_fresh:
+                self.current_prs.add(record["id"])
+            else:
+                refs.append(pull_request_ref(issue))
+                if record is not None:
+                    self.stale_prs.add(record["id"])
+            for name, issue_ids in mention_hits.items():
+                if issue.id not in issue_ids:
+                    continue
+                if is_fresh:
+                    fresh[name].add(record["id"])
+                else:
+                    mentioned_refs[name].add(refs[-1])
+        for name, ids in fresh.items():
+            staged.add(name, *ids)
+        return refs, mentioned_refs
 
     def _notify(self, **kwargs):
         """Trigger a desktop notification (if they are enabled)"""
         if self.CONFIG["desktop_notifications"]:
+            import pync
+
             pync.notify(**kwargs)
 
-    def _parse_notification(self, notification):
+    @staticmethod
+    def _comment_url(notification):
+        comment_url = notification.subject.get("latest_comment_url") or ""
+        return comment_url if "comments" in comment_url else None
+
+    def _fetch_comments(self, notifications):
+        """The latest comments of `notifications`, by URL, fetched concurrently
+
+        Comments are requested through the response cache, so one that was fetched
+        before is revalidated with its ETag rather than downloaded again.
+        """
+        urls = list({self._comment_url(n) for n in notifications} - {None})
+
+        def fetch(url):
+            return json.loads(self._client._get(url).content.decode())
+
+        with ThreadPoolExecutor(max_workers=self.CONFIG["enrichment_workers"]) as executor:
+            return dict(zip(urls, executor.map(fetch, urls)))
+
+    def _parse_notification(self, notification, comments=None):
         notif = notification.subject.copy()
-        comment_url = notif.get("latest_comment_url", "")
-        if comment_url and "comments" in comment_url:
-            notif["comment"] = json.loads(
-                self._client._get(comment_url).content.decode()
-            )
+        comment_url = self._comment_url(notification)
+        if comment_url:
+            if comments is None or comment_url not in comments:
+                comments = self._fetch_comments([notification])
+            notif["comment"] = comments[comment_url]
         notif["cleared"] = False
         notif["reason"] = notification.reason
         notif["updated_at"] = arrow.get(notification.updated_at)
         return notif
 
-    def _parse_pr_from_notification(self, notification):
-        url = notification.subject["url"]
-        url_info = url.replace("https://api.github.com/repos/", "").split("/")
-        pr = self._client.pull_request(url_info[0], url_info[1], int(url_info[3]))
-        parsed = self.parse_pull_request(pr, get_test_status=False)
-        with self.db.transaction() as conn:
-            pull_requests = conn.root.pull_requests
-            pull_requests[pr.id] = parsed
-            conn.root.pull_requests = pull_requests
-        self.current_prs.add(pr.id)
-        return parsed
+    def _get_protection(self, pull_request):
+        repo = pull_request.repository
+        return self.protection.get(
+            (repo.owner.login, repo.name, pull_request.base.ref),
+            lambda: self._backend.protection(pull_request),
+        )
 
-    def _get_full_repo(self, pull_request):
-        short_repo = pull_request.repository
-        return self._client.repository(short_repo.owner.login, short_repo.name)
+    def _fetch_once(self, key, fetch):
+        """Call `fetch` at most once per update for `key`, sharing the result between workers"""
+        with self._fetch_lock:
+            lock = self._key_locks.setdefault(key, threading.Lock())
+        with lock:
+            if key not in self._fetched:
+                self._fetched[key] = fetch()
+            return self._fetched[key]
 
-    def _get_protection(self, pull_request):
-        full_repo = self._get_full_repo(pull_request)
-        return full_repo.branch(pull_request.base.ref).original_protection
+    def _get_codeowners(self, pull_request):
+        repo = pull_request.repository
+        known = self._uow["codeowners"].get(f"{repo.owner.login}|{repo.name}", ())
+        if known != ():
+            return known
+        contents = self._backend.codeowners(pull_request)
+        return None if contents is None else self.parse_codeowners_file(contents)
 
-    def _update_pull_requests(self):
-        self.protection = {}
-        for pull_request in self.get_pull_requests():
-            repo = pull_request.repository
-            repo_key = f"{repo.owner.login}|{repo.name}"
-            if pull_request.base.ref not in self.protection:
-                self.protection[pull_request.base.ref] = self._get_protection(
-                    pull_request
-                )
-            with self.db.transaction() as conn:
-                codeowners = conn.root.codeowners
-                if repo_key not in codeowners:
-                    try:
-                        codeowner_file = pull_request.repository.file_contents(
-                            "CODEOWNERS"
-                        )
-                        codeowner_file_contents = codeowner_file.decoded.decode()
-                        codeowners[repo_key] = self.parse_codeowners_file(
-                            codeowner_file_contents
-                        )
-                    except (NotFoundError, ForbiddenError):
-                        codeowners[repo_key] = None
-                    conn.root.codeowners = codeowners
-            with self.db.transaction() as conn:
-                team_members = conn.root.team_members
-                if repo.owner.login not in team_members:
-                    try:
-                        org = self._client.organization(repo.owner.login)
-                        team_members[repo.owner.login] = self.parse_teamembers(org)
-                    except (NotFoundError, ForbiddenError):
-                        team_members[repo.owner.login] = None
-                conn.root.team_members = team_members
-
-            parsed = self.parse_pull_request(pull_request)
-            with self.db.transaction() as conn:
-                conn.root.pull_requests[pull_request.id] = parsed
-            self.current_prs.add(pull_request.id)
+    def _list_teams(self, login):
+        """An org's teams by name, or None if `login` isn't an org we can see into"""
+        try:
+            org = self._client.organization(login)
+            return {
+                f"{org.login}/{'-'.join(team.name.lower().split())}": team
+                for team in org.teams()
+            }
+        except (NotFoundError, ForbiddenError):
+            return None
+
+    def _refresh_teams(self, orgs, staged):
+        """Refetch the team lists and team members whose `team_ttl` has expired, and
+        record the changes in `staged`
+
+        An org's team list is fetched when the org or any of its teams is stale; then
+        only the new and stale teams' members are fetched, concurrently. Each team's
+        TTL is shortened by a fixed fraction of up to half, derived from its name, so
+        teams first fetched together come due in different updates after that. Listing
+        the org again for them is usually answered by the response cache.
+        """
+        now = time.time()
+        ttl = self.CONFIG["team_ttl"]
+        team_members = self._uow["team_members"]
+        refreshed = self._uow["team_refreshed"]
+
+        def stale(key):
+            jitter = zlib.crc32(key.encode()) % 1000 / 2000
+            return now - refreshed.get(key, 0) >= ttl * (1 - jitter)
+
+        stale_orgs = [
+            org
+            for org in sorted(orgs | set(team_members))
+            if stale(org) or any(stale(team) for team in team_members.get(org) or ())
+        ]
+        if not stale_orgs:
+            return
+        workers = self.CONFIG["enrichment_workers"]
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            listed = {}
+            stale_teams = {}
+            for org, teams in zip(stale_orgs, executor.map(self._list_teams, stale_orgs)):
+                staged.put("team_refreshed", org, now)
+                known = team_members.get(org) or {}
+                listed[org] = None if teams is None else {}
+                for team in set(known) - set(teams or ()):
+                    self.teams.remove(team)
+                    staged.delete("team_refreshed", team)
+                for team, github_team in (teams or {}).items():
+                    if team in known and not stale(team):
+                        listed[org][team] = known[team]
+                    else:
+                        stale_teams[team] = github_team
+            members = executor.map(
+                lambda team: [member.login for member in team.members()],
+                stale_teams.values(),
+            )
+            for team, logins in zip(stale_teams, members):
+                listed[team.split("/")[0]][team] = frozenset(logins)
+                staged.put("team_refreshed", team, now)
+                self.teams.update(team, logins)
+        for org, teams in listed.items():
+            staged.put("team_members", org, teams)
+        logging.info(f"Refreshed {len(stale_orgs)} team lists, {len(stale_teams)} teams")
+
+    def _fetch_pull_request(self, pull_request):
+        """Make all of the API calls needed to store a PR
+
+        Doesn't stage any changes, so it is safe to run from a worker thread; the
+        results are staged by `_store_pull_request`.
+        """
+        repo = pull_request.repository
+        self._get_protection(pull_request)
+        codeowners = self._fetch_once(
+            ("codeowners", repo.owner.login, repo.name),
+            lambda: self._get_codeowners(pull_request),
+        )
+        details = self._fetch_details(pull_request, codeowners)
+        details["codeowners"] = codeowners
+        return details
+
+    def _store_pull_request(self, pull_request, details):
+        repo = pull_request.repository
+        repo_key = f"{repo.owner.login}|{repo.name}"
+        if repo_key not in self._uow["codeowners"]:
+            self._uow.put("codeowners", repo_key, details["codeowners"])
+
+        parsed = self.parse_pull_request(pull_request, details=details)
+        self._uow.put("pull_requests", pull_request.id, parsed)
+        self.current_prs.add(pull_request.id)
+        commit_every = self.CONFIG["commit_every"]
+        if commit_every and not len(self.current_prs) % commit_every:
+            self._uow.commit()
+
+    @staticmethod
+    def _settled(record):
+        """Whether a stored PR is up to date as long as its `updated_at` is
+
+        Check runs finishing and GitHub computing mergeability don't count as updates.
+        """
+        runs = record["test_status"].get("runs", {})
+        return (
+            record["mergeable"] is not None
+            and record["mergeable_state"] != "unknown"
+            and all(conclusion is not None for conclusion, _ in runs.values())
+        )
+
+    def _is_hot(self, record):
+        """Whether a stored PR is refreshed on every update, rather than every
+        `cold_refresh_cycles` updates
+
+        The user's own PRs are hot, so test status and merge conflict notifications
+        arrive promptly, as are PRs whose checks or mergeability are still pending,
+        unless they haven't been updated for `hot_pr_age` seconds.
+        """
+        if record["author"] == self.CONFIG["user"]:
+            return True
+        age = (arrow.now() - record["updated_at"]).total_seconds()
+        return not self._settled(record) and age < self.CONFIG["hot_pr_age"]
+
+    def _refresh_due(self, record):
+        if self._is_hot(record):
+            return True
+        # cold PRs come due on different updates, so they don't all refresh at once
+        cycles = max(self.CONFIG["cold_refresh_cycles"], 1)
+        return (self._cycle + record["id"]) % cycles == 0
+
+    def _carry_over(self):
+        """Keep the PRs an incremental search didn't return, as they were stored
+
+        Only PRs found by the previous discovery are kept, less any the search found
+        closed. The refs of those due a refresh (see `_is_hot`) are returned, to be
+        fetched again; any that turn out to be gone, or that the user can no longer
+        see, are dropped.
+        """
+        found = self.current_prs | self.stale_prs
+        due = []
+        for id_ in self._discovery["pull_requests"] - found:
+            record = self._uow["pull_requests"].get(id_)
+            if record is None or record["url"] in self.closed_prs:
+                continue
+            if self._refresh_due(record):
+                due.append((record["org"], record["repo"], record["number"]))
+            else:
+                self.current_prs.add(id_)
+        return due
+
+    def _discover_pull_requests(self):
+        """Find the PRs to store this update, and return the refs of those to fetch
+
+        Fresh and carried over PRs are added to `current_prs` as they are. Also
+        refreshes the teams of the orgs of the PRs to fetch, which their code owners
+        are checked against when they are stored. Runs in a worker thread, so rather
+        than staging its changes, returns them as `StagedChanges`, along with the refs
+        and the refs that belong in each mention set (see `get_pull_requests`).
+        """
+        self._fetched = {}
+        self._key_locks = {}
+        staged = StagedChanges()
+        searched_at = time.time()
+        user_teams = sorted(self.teams.teams(self.CONFIG["user"]))
+        since = self._search_since(user_teams)
+        refs, mentioned_refs = self.get_pull_requests(since, staged)
+        # search hits whose stored PR is up to date are already in current_prs
+        self.metrics["fresh"] = len(self.current_prs)
+        if since is not None:
+            refs += self._carry_over()
+        self.metrics["carried_over"] = len(self.current_prs) - self.metrics["fresh"]
+        self.metrics["full_search"] = since is None
+        # staged, and only applied once the update has been committed; the PRs
+        # fetched are added as they arrive
+        self._next_discovery = {
+            "searched_at": searched_at,
+            "swept_at": searched_at if since is None else self._discovery["swept_at"],
+            "teams": user_teams,
+            "pull_requests": set(self.current_prs),
+        }
+        self._refresh_teams({owner for owner, _, _ in refs}, staged)
+        return refs, mentioned_refs, staged
+
+    async def _run_update(self):
+        """Discover, enrich and store PRs, and process notifications, as a pipeline
+
+        Discovery needs all of the search results before anything is stored: they
+        decide which stored PRs are carried over, and which teams are refreshed. The
+        PRs it finds are then fetched, and stream through bounded queues as they
+        arrive: up to `enrichment_workers` are enriched at a time in worker threads,
+        and each is stored, in the order it was discovered, as soon as its
+        enrichment finishes. Notifications are polled during discovery and processed
+        once all of the PRs are fetched.
+
+        All changes are staged from the event loop, including those discovery
+        returns. Worker threads only read from the unit of work: the code owners
+        already stored, and whether a PR is muted, which `UnitOfWork.commit` reads
+        again anyway. If a stage fails, the others are cancelled.
+        """
+        workers = self.CONFIG["enrichment_workers"]
+        discovered = asyncio.Queue(maxsize=workers)
+        enriched = asyncio.Queue(maxsize=workers)
+        # all of the PRs fetched, once they are
+        fetched = asyncio.get_running_loop().create_future()
+
+        async def discover_pull_requests():
+            refs, mentioned_refs, staged = await asyncio.to_thread(
+                self._discover_pull_requests
+            )
+            staged.stage(self._uow)
+            return refs, mentioned_refs
+
+        async def fetch_pull_requests():
+            refs, mentioned_refs = await discover_pull_requests()
+            pull_requests = []
+            mentioned = {name: [] for name in mentioned_refs}
+            stream = zip(refs, self._backend.stream(refs))
+            async for ref, pull_request in iterate_in_thread(stream):
+                if pull_request is None:
+                    continue
+                pull_requests.append(pull_request)
+                self._next_discovery["pull_requests"].add(pull_request.id)
+                for name, refs_in_set in mentioned_refs.items():
+                    if ref in refs_in_set:
+                        mentioned[name].append(pull_request.id)
+                yield pull_request
+            for name, ids in mentioned.items():
+                self._uow.add(name, *ids)
+            self.metrics["enriched"] = len(pull_requests)
+            fetched.set_result(pull_requests)
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+
+            async def enrich():
+                loop = asyncio.get_running_loop()
+                async for pull_request in consume(discovered):
+                    details = loop.run_in_executor(
+                        executor, self._fetch_pull_request, pull_request
+                    )
+                    await enriched.put((pull_request, details))
+                await enriched.put(None)
+
+            async def persist():
+                async for pull_request, details in consume(enriched):
+                    self._store_pull_request(pull_request, await details)
+
+            await run_stages(
+                feed(discovered, fetch_pull_requests()),
+                enrich(),
+                persist(),
+                self._update_notifications(fetched),
+            )
 
     def _should_notify(self, notif):
         id_ = notif["pr_id"]
-        with self.db.transaction() as conn:
-            if conn.root.pull_requests[id_]["muted"]:
-                return False
+        # a newly discovered PR may not be stored yet, but then it isn't muted
+        if self._uow["pull_requests"].get(id_, {}).get("muted"):
+            return False
         if self.CONFIG["mentions_only"] and self.CONFIG["team_mentions"]:
-            with self.db.transaction() as conn:
-                return id_ in conn.root.mentioned or id_ in conn.root.team_mentioned
+            return id_ in self._uow["mentioned"] or id_ in self._uow["team_mentioned"]
         if self.CONFIG["mentions_only"] and not self.CONFIG["team_mentions"]:
-            with self.db.transaction() as conn:
-                return id_ in conn.root.mentioned
+            return id_ in self._uow["mentioned"]
         return True
 
-    def _update_notifications(self, mentions_only=False):
-        with self.db.transaction() as conn:
-            prs_by_url = {pr["url"]: pr for pr in conn.root.pull_requests.values()}
-        for notification in self._client.notifications():
+    def _poll_notifications(self):
+        """Unread notification threads, or None if they haven't changed
+
+        Doesn't poll before the `X-Poll-Interval` GitHub gave with the previous poll
+        has passed, and sends that poll's `Last-Modified`, so an unchanged list only
+        costs a 304. It asks for every unread thread rather than only those updated
+        since the previous poll, since threads that were read elsewhere are noticed
+        by their absence.
+        """
+        previous = self._notification_poll
+        polled_at = time.time()
+        if previous and polled_at < previous["polled_at"] + previous["interval"]:
+            return None
+        threads = self._client.notifications()
+        if previous and previous["last_modified"]:
+            # sent explicitly, so the response cache passes a 304 through
+            threads.headers["If-Modified-Since"] = previous["last_modified"]
+        unread = list(threads)
+        headers = threads.last_response.headers
+        # a 304 may leave out Last-Modified, which still holds for the next poll
+        last_modified = headers.get("Last-Modified") or (
+            previous["last_modified"] if previous else None
+        )
+        # staged, and only applied once the update has been committed
+        self._next_notification_poll = {
+            "polled_at": polled_at,
+            "interval": int(headers.get("X-Poll-Interval", 0)),
+            "last_modified": last_modified,
+        }
+        return None if threads.last_status == 304 else unread
+
+    def _keep_notification_pr(self, notif, live_prs):
+        """Keep the stored PR an unchanged notification refers to
+
+        Returns False if the PR is neither stored nor in `live_prs`, the PRs being
+        stored this update, so the notification needs processing.
+        """
+        if notif["pr_id"] is None or notif["pr_id"] in live_prs:
+            return True
+        if notif["pr_id"] not in self._uow["pull_requests"]:
+            return False
+        self.current_prs.add(notif["pr_id"])
+        return True
+
+    def _fetch_notification_pr(self, notification, enriched_repos):
+        """The parsed PR a notification refers to, or None if it can't be fetched;
+        makes API calls but stages nothing
+
+        The code owners of repos in `enriched_repos` may not be stored yet, so they
+        are shared with the enrichment of that repo's PRs.
+        """
+        url = notification.subject["url"]
+        url_info = url.replace(f"{self._client.session.base_url}/repos/", "").split("/")
+        pr = self._backend.pull_request(url_info[0], url_info[1], int(url_info[3]))
+        if pr is None:
+            return None
+        repo = pr.repository
+        if (repo.owner.login, repo.name) in enriched_repos:
+            codeowners = self._fetch_once(
+                ("codeowners", repo.owner.login, repo.name),
+                lambda: self._get_codeowners(pr),
+            )
+        else:
+            codeowners = self._uow["codeowners"].get(f"{repo.owner.login}|{repo.name}")
+        details = self._fetch_details(pr, codeowners, get_test_status=False)
+        details["codeowners"] = codeowners
+        return self.parse_pull_request(pr, details=details)
+
+    async def _update_notifications(self, fetched):
+        """Pipeline stage processing notifications; see `_run_update`
+
+        `fetched` is a future of the PRs discovery fetched. They are only stored as
+        they are enriched, so they are matched to notifications by what was fetched
+        rather than by what is stored.
+        """
+        self._next_notification_poll = self._notification_poll
+        threads = await asyncio.to_thread(self._poll_notifications)
+        comments = {}
+        if threads is not None:
+            # fetch the comments of all new threads up front, rather than one by one
+            comments = await asyncio.to_thread(
+                self._fetch_comments,
+                [n for n in threads if int(n.id) not in self._uow["notifications"]],
+            )
+        pull_requests = await fetched
+        live_prs = self._next_discovery["pull_requests"]
+        if threads is None:
+            # nothing has changed, so keep everything as it is
+            for notif_id, notif in self._uow["notifications"].items():
+                self.current_notifications[notif_id] = None
+                self._keep_notification_pr(notif, live_prs)
+            return
+        prs_by_url = {pr["url"]: pr for pr in self._uow["pull_requests"].values()}
+        enriched_repos = set()
+        for pull_request in pull_requests:
+            repo = pull_request.repository
+            enriched_repos.add((repo.owner.login, repo.name))
+            prs_by_url[pull_request.url] = {
+                "id": pull_request.id,
+                "browser_url": pull_request.html_url,
+            }
+        for notification in threads:
             notif_id = int(notification.id)
             self.current_notifications[int(notification.id)] = notification
-            with self.db.transaction() as conn:
-                new = notif_id not in conn.root.notifications
+            new = notif_id not in self._uow["notifications"]
             if new:
-                parsed = self._parse_notification(notification)
+                parsed = self._parse_notification(notification, comments)
             else:
-                with self.db.transaction() as conn:
-                    parsed = conn.root.notifications[notif_id]
-                    if conn.root.notifications[notif_id]["cleared"]:
-                        notification.mark()
+                parsed = dict(self._uow["notifications"][notif_id])
+                if parsed["cleared"]:
+                    await asyncio.to_thread(notification.mark)
+                updated_at = arrow.get(notification.updated_at)
+                # only threads updated since they were stored need processing
+                if parsed["updated_at"] == updated_at and self._keep_notification_pr(
+                    parsed, live_prs
+                ):
+                    continue
+                parsed["updated_at"] = updated_at
 
             corresponding_pr = prs_by_url.get(notification.subject["url"])
             if (
                 corresponding_pr is None
-                or corresponding_pr["id"] not in self.current_prs
+                or (
+                    corresponding_pr["id"] not in live_prs
+                    and corresponding_pr["id"] not in self.current_prs
+                )
             ) and parsed["type"] == "PullRequest":
-                corresponding_pr = self._parse_pr_from_notification(notification)
+                corresponding_pr = await asyncio.to_thread(
+                    self._fetch_notification_pr, notification, enriched_repos
+                )
+                if corresponding_pr is not None:
+                    self._uow.put(
+                        "pull_requests", corresponding_pr["id"], corresponding_pr
+                    )
+                    self.current_prs.add(corresponding_pr["id"])
             parsed["pr_id"] = corresponding_pr["id"] if corresponding_pr else None
             parsed["pr_url"] = (
                 corresponding_pr["browser_url"] if corresponding_pr else None
@@ -354,97 +864,85 @@ class GitHubClient:
                     open=parsed["pr_url"],
                 )
 
-            with self.db.transaction() as conn:
-                conn.root.notifications[notif_id] = parsed
+            self._uow.put("notifications", notif_id, parsed)
 
     def update(self):
+        start = time.time()
         self.current_notifications = {}
         self.current_prs = set()
-        self._update_pull_requests()
-        self._update_notifications(mentions_only=load_config()["mentions_only"])
+        self.metrics = {}
+        self.rate_limiter.reset_counts()
+        self._cycle += 1
+        # stage all changes for this update, and write them in one transaction
+        self._uow = UnitOfWork(self.db)
+        asyncio.run(self._run_update())
         # clear any old notifications
-        with self.db.transaction() as conn:
-            conn.root.notifications = {
-                id_: notif
-                for id_, notif in conn.root.notifications.items()
-                if id_ in self.current_notifications
-            }
-            # clear any old pull requests
-            conn.root.pull_requests = {
-                pr["id"]: pr
-                for pr in conn.root.pull_requests.values()
-                if pr["id"] in self.current_prs
-            }
-        with self.db.transaction() as conn:
-            conn.root.last_update = arrow.now()
-        self.db.pack()
+        for id_ in list(self._uow["notifications"]):
+            if id_ not in self.current_notifications:
+                self._uow.delete("notifications", id_)
+        # clear any old pull requests, and their ids from the mention sets
+        for id_ in list(self._uow["pull_requests"]):
+            if id_ not in self.current_prs:
+                self._uow.delete("pull_requests", id_)
+        for name in SETS:
+            self._uow.discard(name, *(set(self._uow[name]) - self.current_prs))
+        self._uow.set("last_update", arrow.now())
+        self.schedule = self._plan_schedule()
+        self._uow.set("schedule", self.schedule)
+        self._uow.commit()
+        self._discovery = self._next_discovery
+        self._notification_poll = self._next_notification_poll
+        self.metrics["duration"] = time.time() - start
+        self.metrics["commits"] = self._uow.commits
+        logging.info(
+            f"Update took {self.metrics['duration']:.1f}s, {self._uow.commits} commits, "
+            f"{'full' if self.metrics['full_search'] else 'incremental'} search, "
+            f"{self.metrics['enriched']} PRs fetched, {self.metrics['fresh']} fresh, "
+            f"{self.metrics['carried_over']} carried over"
+        )
+        self._cache.log_stats()
+        self._cache.save()
+        self.render_snapshot()
 
     def parse_codeowners_file(self, file_contents):
-        codeowners = []
-        for line in file_contents.split("\n"):
-            line = line.strip()
-            if line and not line.startswith("#"):
-                path, owners = line.split(maxsplit=1)
-                codeowners.append(
-                    (path, tuple(sorted(owners.replace("@", "").split())))
-                )
-        return codeowners
+        return CodeOwners.parse(file_contents)
 
-    def parse_teamembers(self, org):
-        team_members = {}
-        for team in org.teams():
-            members = [member.login for member in team.members()]
-            team_name = "-".join(team.name.lower().split())
-            team_members[f"{org.login}/{team_name}"] = members
-        return team_members
+    def _codeowners_matcher(self, repo_key, codeowner_info):
+        """Compiled CODEOWNERS rules for a repo, only recompiled when the rules change"""
+        if not isinstance(codeowner_info, CodeOwners):
+            # stored by a version that kept the rules as a list
+            codeowner_info = CodeOwners(codeowner_info)
+        if self._codeowners.get(repo_key) != codeowner_info:
+            self._codeowners[repo_key] = codeowner_info
+        return self._codeowners[repo_key]
 
-    def get_pr_codeowners(self, pr, reviews):
+    def get_pr_codeowners(self, pr, reviews, filenames, codeowner_info=None):
         all_owners = {}
-        with self.db.transaction() as conn:
-            codeowner_info = conn.root.codeowners.get(
-                f"{pr.repository.owner.login}|{pr.repository.name}"
-            )
+        repo_key = f"{pr.repository.owner.login}|{pr.repository.name}"
+        if codeowner_info is None:
+            codeowner_info = self._uow["codeowners"].get(repo_key)
         if codeowner_info:
-            for file in pr.files():
-                file_owners = None
-                for path, owners in codeowner_info:
-                    if path == "*":
-                        file_owners = owners
-                    if path in f"/{file.filename}":
-                        file_owners = owners
+            matcher = self._codeowners_matcher(repo_key, codeowner_info)
+            approvers = {
+                user for user, review in reviews.items() if review["state"] == "APPROVED"
+            }
+            for filename in filenames:
+                file_owners = matcher.owners(filename)
                 if file_owners and file_owners not in all_owners:
-                    approved = False
-                    if reviews:
-                        for owner in file_owners:
-                            if "/" in owner:
-                                with self.db.transaction() as conn:
-                                    if any(
-                                        user
-                                        in conn.root.team_members.get(
-                                            pr.repository.owner.login, {}
-                                        ).get(owner, ())
-                                        and review["state"] == "APPROVED"
-                                        for user, review in reviews.items()
-                                    ):
-                                        approved = True
-                                        break
-                            else:
-                                if any(
-                                    user == owner
-                                    and review["state"] == "APPROVED"
-                                    for user, review in reviews.items()
-                                ):
-                                    approved = True
-                                    break
-
+                    approved = any(
+                        any(self.teams.is_member(user, owner) for user in approvers)
+                        if "/" in owner
+                        else owner in approvers
+                        for owner in file_owners
+                    )
                     all_owners["|".join(file_owners)] = approved
         return all_owners
 
     def parse_reviews(self, pull_request):
         reviews = {}
-        for review in pull_request.reviews():
-            # if review.user.login != self.CONFIG["user"]:
-            reviews[review.user.login] = {"state": review.state}
+        for login, state in self._backend.reviews(pull_request):
+            # if login != self.CONFIG["user"]:
+            reviews[login] = {"state": state}
         return reviews
 
     def _format_pr_description(self, pull_request):
@@ -453,10 +951,25 @@ class GitHubClient:
             f"{pull_request.number}: {pull_request.title}"
         )
 
-    def parse_pull_request(self, pull_request, get_test_status=True):
-        reviews = self.parse_reviews(pull_request)
-        with self.db.transaction() as conn:
-            previous = conn.root.pull_requests.get(pull_request.id, {})
+    def _fetch_details(self, pull_request, codeowner_info, get_test_status=True):
+        return {
+            "reviews": self.parse_reviews(pull_request),
+            "filenames": self._backend.filenames(pull_request)
+            if codeowner_info
+            else [],
+            "test_status": {}
+            if pull_request.merged or not get_test_status
+            else self._get_test_status(pull_request),
+        }
+
+    def parse_pull_request(self, pull_request, get_test_status=True, details=None):
+        if details is None:
+            codeowner_info = self._uow["codeowners"].get(
+                f"{pull_request.repository.owner.login}|{pull_request.repository.name}"
+            )
+            details = self._fetch_details(pull_request, codeowner_info, get_test_status)
+        reviews = details["reviews"]
+        previous = self._uow["pull_requests"].get(pull_request.id, {})
         parsed = {
             "base": pull_request.base.ref,
             "head": pull_request.head.ref,
@@ -473,18 +986,14 @@ class GitHubClient:
             "id": pull_request.id,
             "repo": pull_request.repository.name,
             "org": pull_request.repository.owner.login,
-            "protected": self.protection.get(pull_request.base.ref, {}).get(
-                "enabled", False
-            ),
+            "protected": self._get_protection(pull_request).get("enabled", False),
             "title": pull_request.title,
             "number": pull_request.number,
         }
-        parsed["test_status"] = (
-            {}
-            if pull_request.merged or not get_test_status
-            else self._get_test_status(pull_request)
+        parsed["test_status"] = details["test_status"]
+        parsed["owners"] = self.get_pr_codeowners(
+            pull_request, reviews, details["filenames"], details.get("codeowners")
         )
-        parsed["owners"] = self.get_pr_codeowners(pull_request, reviews)
 
         if (
             previous
@@ -516,21 +1025,20 @@ class GitHubClient:
             )
 
     def _get_test_status(self, pull_request):
-        repo = self._get_full_repo(pull_request)
-        commit = repo.commit(repo.branch(pull_request.head.ref).latest_sha())
-        protected = self.protection[pull_request.base.ref]["enabled"]
+        protection = self._get_protection(pull_request)
+        protected = protection["enabled"]
         in_progress = False
         suite_outcome = None
         runs = {}
         conclusions = set()
-        for check in commit.check_runs():
-            required = check.name in self.protection[pull_request.base.ref][
-                "required_status_checks"
-            ].get("contexts", [])
-            runs[check.name] = (check.conclusion, required)
+        for name, status, conclusion in self._backend.check_runs(pull_request):
+            required = name in protection["required_status_checks"].get(
+                "contexts", []
+            )
+            runs[name] = (conclusion, required)
             if required:
-                if check.status == "completed":
-                    conclusions.add(check.conclusion)
+                if status == "completed":
+                    conclusions.add(conclusion)
                 else:
                     in_progress = True
         if in_progress:
@@ -548,26 +1056,3 @@ class GitHubClient:
                 suite_outcome = "success"
         return {"outcome": suite_outcome if protected else None, "runs": runs}
 
-
-def main():
-    if len(sys.argv) == 1:
-        GitHubClient.run_server()
-    if sys.argv[1] == "open":
-        client = GitHubClient()
-        client.open_notification(int(sys.argv[2]))
-    if sys.argv[1] == "clear":
-        client = GitHubClient()
-        client.clear_notification(int(sys.argv[2]))
-    if sys.argv[1] == "clearall":
-        GitHubClient().clear_all_notifications()
-    if sys.argv[1] == "mute":
-        client = GitHubClient()
-        client.mute_pr(int(sys.argv[2]))
-    if sys.argv[1] == "unmute":
-        client = GitHubClient()
-        client.unmute_pr(int(sys.argv[2]))
-    if sys.argv[1] == "config":
-        update_config(sys.argv[2], sys.argv[3])
-    if sys.argv[1] == "refresh":
-        client = GitHubClient()
-        client.update()
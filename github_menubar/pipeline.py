@@ -0,0 +1,54 @@
+"""Helpers for running an update as a pipeline of asyncio stages
+
+Stages are coroutines connected by bounded `asyncio.Queue`s. A stage that gets ahead
+of the next one waits for room in the queue between them, and a queue's producer
+puts None on it once it is done.
+"""
+import asyncio
+
+
+async def feed(queue, items):
+    """Put `items`, an iterable or async iterable, on `queue`, then None to mark the end"""
+    if hasattr(items, "__aiter__"):
+        async for item in items:
+            await queue.put(item)
+    else:
+        for item in items:
+            await queue.put(item)
+    await queue.put(None)
+
+
+async def consume(queue):
+    """Iterate over the items on `queue` until the None that marks the end"""
+    while True:
+        item = await queue.get()
+        if item is None:
+            return
+        yield item
+
+
+async def iterate_in_thread(iterator):
+    """Iterate over a blocking `iterator`, getting each item in a worker thread"""
+    end = object()
+    while True:
+        item = await asyncio.to_thread(next, iterator, end)
+        if item is end:
+            return
+        yield item
+
+
+async def run_stages(*stages):
+    """Run `stages` concurrently until all of them finish
+
+    If one fails, the others are cancelled, and its error is raised once they have
+    stopped. Work already handed to a thread can't be interrupted, so a stage
+    waiting on a thread stops when that work finishes.
+    """
+    tasks = [asyncio.ensure_future(stage) for stage in stages]
+    try:
+        await asyncio.gather(*tasks)
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        raise
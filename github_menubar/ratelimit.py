@@ -0,0 +1,172 @@
+"""Staying within GitHub's rate limits
+
+`RateLimiter` wraps the API session: it spaces out requests with a token bucket,
+counts the requests each update makes against each of GitHub's budgets, and pauses
+all requests when GitHub answers with a rate limit error. After each update,
+`plan_interval` picks the time until the next one so that, at the rate the last
+update used them, the remaining budgets last until they are reset.
+"""
+import logging
+import threading
+import time
+from urllib.parse import urlparse
+
+RESOURCES = ("core", "search", "graphql")
+
+
+class RateLimited(Exception):
+    """GitHub asked us to stop making requests until `until` (a timestamp)"""
+
+    def __init__(self, until):
+        super().__init__(f"Rate limited until {time.ctime(until)}")
+        self.until = until
+
+
+class TokenBucket:
+    """Allows `rate` calls per second on average, in bursts of up to `capacity`"""
+
+    def __init__(self, rate, capacity, clock=time.monotonic, sleep=time.sleep):
+        self.rate = rate
+        self.capacity = capacity
+        self._clock = clock
+        self._sleep = sleep
+        self._tokens = capacity
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Take a token, waiting for one if the bucket is empty"""
+        with self._lock:
+            now = self._clock()
+            self._tokens = min(
+                self.capacity, self._tokens + (now - self._updated) * self.rate
+            )
+            self._updated = now
+            self._tokens -= 1
+            # a negative balance is the wait owed by this caller
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0
+        if wait:
+            self._sleep(wait)
+
+
+def resource(url):
+    """The rate limit budget a request to `url` counts against"""
+    path = urlparse(url).path
+    if "/search/" in path:
+        return "search"
+    if path.endswith("/graphql"):
+        return "graphql"
+    return "core"
+
+
+class RateLimiter:
+    """Throttles and counts the requests made through a session
+
+    Args:
+        per_minute: average number of requests per minute allowed by the token
+            bucket, which holds a minute's worth; 0 for no limit
+        max_wait: longest pause, in seconds, to wait out before retrying a request
+            that hit a rate limit; for longer ones, `RateLimited` is raised
+        backoff: first pause after a secondary rate limit that didn't say how long
+            to wait; doubled each time it is hit again
+    """
+
+    def __init__(
+        self, per_minute, max_wait=60, backoff=60, clock=time.time, sleep=time.sleep
+    ):
+        self.bucket = None
+        if per_minute:
+            self.bucket = TokenBucket(per_minute / 60, per_minute, sleep=sleep)
+        self.max_wait = max_wait
+        self.backoff = backoff
+        self.paused_until = 0
+        self._clock = clock
+        self._sleep = sleep
+        self._next_backoff = backoff
+        self._lock = threading.Lock()
+        self.reset_counts()
+
+    def reset_counts(self):
+        with self._lock:
+            self.counts = dict.fromkeys(RESOURCES, 0)
+
+    def install(self, session):
+        """Wrap `session.request` so requests are throttled, counted and paused"""
+        request = session.request
+
+        def limited_request(method, url, *args, **kwargs):
+            for attempt in range(3):
+                self._wait()
+                if self.bucket is not None:
+                    self.bucket.acquire()
+                response = request(method, url, *args, **kwargs)
+                if not self._limited(response):
+                    break
+            with self._lock:
+                # conditional requests answered with a 304 are free
+                if response.status_code != 304 and not url.endswith("/rate_limit"):
+                    self.counts[resource(url)] += 1
+            return response
+
+        session.request = limited_request
+
+    def _wait(self):
+        pause = self.paused_until - self._clock()
+        if pause > self.max_wait:
+            raise RateLimited(self.paused_until)
+        if pause > 0:
+            self._sleep(pause)
+
+    def _limited(self, response):
+        """Pause requests if `response` is a rate limit error; True if it was one"""
+        if response.status_code not in (403, 429):
+            with self._lock:
+                self._next_backoff = self.backoff
+            return False
+        headers = response.headers
+        now = self._clock()
+        if headers.get("Retry-After"):
+            until = now + int(headers["Retry-After"])
+        elif headers.get("X-RateLimit-Remaining") == "0":
+            until = int(headers.get("X-RateLimit-Reset", now + self.backoff))
+        elif "secondary rate limit" in response.text.lower():
+            with self._lock:
+                until = now + self._next_backoff
+                self._next_backoff *= 2
+        else:
+            # an ordinary permission error
+            return False
+        with self._lock:
+            self.paused_until = max(self.paused_until, until)
+        logging.warning(f"Rate limited by GitHub until {time.ctime(until)}")
+        return True
+
+
+def plan_interval(budgets, used, interval, max_interval, reserve=0.0, now=None):
+    """Seconds until the next update, given the rate limit budgets
+
+    Args:
+        budgets: {resource: {"limit":, "remaining":, "reset":}}, as in GitHub's
+            `rate_limit` response
+        used: {resource: requests the last update made against it}
+        interval: the shortest interval to return
+        max_interval: the longest interval to return, unless a budget is used up,
+            in which case it is the time until that budget is reset
+        reserve: fraction of each budget to leave for other clients
+    """
+    now = time.time() if now is None else now
+    planned = interval
+    exhausted_until = 0
+    for name, budget in budgets.items():
+        per_update = used.get(name, 0)
+        if not per_update:
+            continue
+        until_reset = max(budget["reset"] - now, 0)
+        available = budget["remaining"] - reserve * budget["limit"]
+        if available < per_update:
+            # not enough left for another update before the reset
+            exhausted_until = max(exhausted_until, until_reset)
+        else:
+            # spread the updates the budget has room for evenly until the reset
+            planned = max(planned, until_reset / (available // per_update))
+    return max(min(planned, max_interval), exhausted_until)
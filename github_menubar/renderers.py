@@ -1,10 +1,10 @@
+import io
 import sys
 from datetime import datetime
 
-from tabulate import tabulate
-
 from github_menubar.config import COLORS, CONFIG, GLYPHS, TREX
-from github_menubar.github_client import GitHubClient
+from github_menubar.state import StateClient, StateView
+from github_menubar.tables import format_table
 from github_menubar.utils import load_config
 
 REVIEW_STATE_MAP = {
@@ -35,6 +35,7 @@ MERGE_STATE_COLOR_MAP = {
 
 MAX_LENGTH = 100
 MAX_PR_LENGTH = 60
+GMB_PATH = f"{sys.executable.rsplit('/', 1)[0]}/gmb"
 
 
 def chunkstring(string, length):
@@ -47,50 +48,26 @@ class Renderer:
     Implements generic renderer functionality.
     """
 
-    def __init__(self):
+    def __init__(self, client=None):
         self.CONFIG = load_config()
         self.PID = open(CONFIG["pid_file"]).read().strip()
-        self._client = GitHubClient()
-        self.state = self._get_state()
-        self.muted_prs = self._get_muted_prs()
+        self._client = client or StateClient()
+        self.state = StateView(self._get_state(), self.CONFIG["user"])
+        self.muted_prs = self.state["muted_prs"]
+        if client is None:
+            # everything is read up front; release the connection and its cache
+            self._client.close()
         self.error = False
 
     def _get_state(self):
         state = self._client.get_state()
         return state
 
-    def _get_muted_prs(self):
-        return self._client.get_muted_prs()
-
     def transform_pr_url(self, api_url):
         return api_url.replace("api.github.com/repos", "github.com").replace(
             "/pulls/", "/pull/"
         )
 
-    @property
-    def _user_prs(self):
-        return [
-            pull_request
-            for pull_request in self.state["pull_requests"].values()
-            if pull_request["author"] == self.CONFIG["user"]
-            and pull_request["state"] not in ("CLOSED", "MERGED")
-        ]
-
-    @property
-    def _involved_prs(self):
-        return [
-            pull_request
-            for pull_request in self.state["pull_requests"].values()
-            if (
-                pull_request["author"] != self.CONFIG["user"]
-                and pull_request["state"] not in ("CLOSED", "MERGED")
-            )
-        ]
-
-    @property
-    def _pr_urls(self):
-        return {pr["url"]: pr for pr in self.state["pull_requests"].values()}
-
 
 class BitBarRenderer(Renderer):
     def _format(self, pr):
@@ -103,20 +80,12 @@ class BitBarRenderer(Renderer):
         rows = []
         ids = []
         notif_ids = []
-        for notif_id, notification in self.state["notifications"].items():
-            pr = self._pr_urls.get(notification["url"])
-            if pr:
-                desc = self._format(pr)
-                rows.append([desc, pr["author"], pr["state"]])
-                ids.append(pr["id"])
-                notif_ids.append(notif_id)
-        return (
-            tabulate(rows, headers=["PR", "author", "state"], tablefmt="plain").split(
-                "\n"
-            ),
-            ids,
-            notif_ids,
-        )
+        for notif_id, notification, pr in self.state.notification_prs:
+            desc = self._format(pr)
+            rows.append([desc, pr["author"], pr["state"]])
+            ids.append(pr["id"])
+            notif_ids.append(notif_id)
+        return format_table(rows, headers=["PR", "author", "state"]), ids, notif_ids
 
     def _colorize_pr(self, pull_request):
         if pull_request["state"] == "CLOSED":
@@ -168,7 +137,7 @@ class BitBarRenderer(Renderer):
             )
             ids.append(pull_request["id"])
         return (
-            tabulate(
+            format_table(
                 rows,
                 headers=[
                     "description",
@@ -177,8 +146,7 @@ class BitBarRenderer(Renderer):
                     GLYPHS["tests"],
                     GLYPHS["approval"],
                 ],
-                tablefmt="plain",
-            ).split("\n"),
+            ),
             ids,
         )
 
@@ -201,7 +169,7 @@ class BitBarRenderer(Renderer):
                         GLYPHS["success"] if approved else GLYPHS["in_progress"],
                     ]
                 )
-            result.append((tabulate(rows, tablefmt="plain").split("\n"), colors))
+            result.append((format_table(rows), colors))
         return result
 
     def _build_review_tables(self, prs):
@@ -212,39 +180,13 @@ class BitBarRenderer(Renderer):
                 glyph = GLYPHS[REVIEW_STATE_MAP[review["state"]]]
                 rows.append([user, glyph])
             if rows:
-                result.append(tabulate(rows, tablefmt="plain").split("\n"))
+                result.append(format_table(rows))
             else:
                 result.append(None)
         return result
 
     def _get_header_info(self):
-        n_notifications = len(
-            [
-                notif
-                for notif in self.state["notifications"].values()
-                if notif["url"] in self._pr_urls
-            ]
-        )
-        n_failing_tests = 0
-        n_open_prs = 0
-        n_merge_conflicts = 0
-        n_ready = 0
-        for pr in self.state["pull_requests"].values():
-            if pr["author"] == self.CONFIG["user"]:
-                n_open_prs += 1
-                if pr["test_status"] and pr["test_status"].get("outcome") == "failure":
-                    n_failing_tests += 1
-                if pr["mergeable_state"] == "dirty":
-                    n_merge_conflicts += 1
-                if pr["mergeable_state"] in ("clean", "unstable"):
-                    n_ready += 1
-        return {
-            "n_notifications": n_notifications,
-            "n_failing_tests": n_failing_tests,
-            "n_open_prs": n_open_prs,
-            "n_merge_conflicts": n_merge_conflicts,
-            "n_ready": n_ready,
-        }
+        return dict(self.state.header)
 
     def _build_header(
         self, n_notifications, n_open_prs, n_failing_tests, n_merge_conflicts, n_ready
@@ -281,27 +223,28 @@ class BitBarRenderer(Renderer):
     ):
         font = font or self.CONFIG["font"]
         if string is not None:
-            result = f"{'--' * indent}{string}|{font} length={MAX_LENGTH}"
+            parts = [f"{'--' * indent}{string}|{font} length={MAX_LENGTH}"]
             if color:
-                result += f" color={color}"
+                parts.append(f"color={color}")
             if href:
-                result += f" href={href}"
+                parts.append(f"href={href}")
             if refresh:
-                result += " refresh=true"
+                parts.append("refresh=true")
             if alternate:
-                result += " alternate=true"
+                parts.append("alternate=true")
             if bash:
-                result += f" bash={bash} terminal={str(open_terminal).lower()}"
+                parts.append(f"bash={bash} terminal={str(open_terminal).lower()}")
             if param1 is not None:
-                result += f" param1={param1}"
+                parts.append(f"param1={param1}")
             if param2 is not None:
-                result += f" param2={param2}"
+                parts.append(f"param2={param2}")
             if param3 is not None:
-                result += f" param3={param3}"
-            print(result)
+                parts.append(f"param3={param3}")
+            self._out.write(" ".join(parts))
+            self._out.write("\n")
 
     def _section_break(self, indent=0):
-        print(f"{'--' * indent}---")
+        self._out.write(f"{'--' * indent}---\n")
 
     def _pr_section(self, pull_requests, name):
         pr_table, ids = self._build_pr_table(pull_requests)
@@ -314,7 +257,7 @@ class BitBarRenderer(Renderer):
         for row, id_, codeowners, reviews in zip(
             pr_table[1:], ids, codeowner_info, review_info
         ):
-            pull_request = self.state["pull_requests"][id_]
+            pull_request = self.state.pull_requests[id_]
             self._printer(
                 row,
                 color=self._colorize_pr(pull_request),
@@ -374,9 +317,22 @@ class BitBarRenderer(Renderer):
             )
 
     def _get_gmb(self):
-        return f"{sys.executable.rsplit('/', 1)[0]}/gmb"
+        return GMB_PATH
+
+    def render(self):
+        """The menu, as a string
+
+        Lines are written to an in-memory buffer rather than printed one by one.
+        """
+        self._out = io.StringIO()
+        self._build_menu()
+        return self._out.getvalue()
 
-    def print_state(self):
+    def print_state(self, out=None):
+        """Write the menu to `out`, any file or stream (stdout by default), in one write"""
+        (out or sys.stdout).write(self.render())
+
+    def _build_menu(self):
         if self.error:
             self._printer(GLYPHS["github_logo"])
             self._section_break()
@@ -407,7 +363,7 @@ class BitBarRenderer(Renderer):
                 f"{GLYPHS['success']} Mergeable: {header_info['n_ready']}", indent=1
             )
             self._section_break()
-            if len(self.state["pull_requests"]) == 0:
+            if len(self.state.pull_requests) == 0:
                 self._printer(TREX)
             else:
                 notif_pr_table, pr_ids, notif_ids = self._build_notification_pr_table()
@@ -425,7 +381,7 @@ class BitBarRenderer(Renderer):
                     for row, pr_id, notif_id in zip(
                         notif_pr_table[1:], pr_ids, notif_ids
                     ):
-                        url = self.state["pull_requests"][pr_id]["browser_url"]
+                        url = self.state.pull_requests[pr_id]["browser_url"]
                         self._printer(
                             row,
                             bash=self._get_gmb(),
@@ -434,16 +390,16 @@ class BitBarRenderer(Renderer):
                             refresh=True,
                         )
                         self._printer(
-                            self.state["pull_requests"][pr_id]["description"], indent=1
+                            self.state.pull_requests[pr_id]["description"], indent=1
                         )
                         self._printer(
-                            self.state["notifications"][notif_id]["updated_at"]
+                            self.state.notifications[notif_id]["updated_at"]
                             .to("local")
                             .format(CONFIG["date_format"]),
                             indent=1,
                         )
                         self._printer(
-                            f"Reason: {self.state['notifications'][notif_id]['reason']}",
+                            f"Reason: {self.state.notifications[notif_id]['reason']}",
                             indent=1,
                         )
                         self._section_break(indent=1)
@@ -456,7 +412,7 @@ class BitBarRenderer(Renderer):
                             indent=1,
                         )
                         self._section_break(indent=1)
-                        comment = self.state["notifications"][notif_id].get(
+                        comment = self.state.notifications[notif_id].get(
                             "comment", {}
                         )
                         if comment.get("body_text"):
@@ -475,11 +431,11 @@ class BitBarRenderer(Renderer):
                             param2="'printf {} | pbcopy'".format(url),
                         )
 
-                if self._user_prs:
-                    self._pr_section(self._user_prs, "MY PULL REQUESTS")
+                if self.state.user_prs:
+                    self._pr_section(self.state.user_prs, "MY PULL REQUESTS")
 
-                if self._involved_prs:
-                    self._pr_section(self._involved_prs, "WATCHING")
+                if self.state.involved_prs:
+                    self._pr_section(self.state.involved_prs, "WATCHING")
 
             self._section_break()
             self._printer("Options")
@@ -584,3 +540,14 @@ class BitBarRenderer(Renderer):
             else:
                 update_time = "None"
             self._printer(f"Last update: {update_time}", indent=1)
+            schedule = self.state.get("schedule")
+            if schedule:
+                next_run = schedule["next_run"].to("local").format(CONFIG["date_format"])
+                self._printer(f"Next update: {next_run}", indent=1)
+                for name, budget in sorted(schedule["budgets"].items()):
+                    reset = datetime.fromtimestamp(budget["reset"]).strftime("%H:%M")
+                    self._printer(
+                        f"API budget ({name}): {budget['remaining']}/{budget['limit']}, "
+                        f"resets at {reset}",
+                        indent=1,
+                    )
@@ -0,0 +1,195 @@
+from collections import OrderedDict
+import logging
+import os
+import pickle
+import threading
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+
+
+class HostLimiter:
+    """Caps the number of requests in flight to any one host"""
+
+    def __init__(self, limit):
+        self.limit = limit
+        self._lock = threading.Lock()
+        self._semaphores = {}
+
+    def semaphore(self, url):
+        host = urlparse(url).netloc
+        with self._lock:
+            if host not in self._semaphores:
+                self._semaphores[host] = threading.BoundedSemaphore(self.limit)
+            return self._semaphores[host]
+
+
+def limit_concurrency(session, per_host, pool_size):
+    """Prepare a requests session for use from a pool of worker threads
+
+    Grows the connection pool to `pool_size` so workers don't discard connections,
+    and wraps `session.request` so at most `per_host` requests run against any one
+    host at a time.
+    """
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    limiter = HostLimiter(per_host)
+    request = session.request
+
+    def limited_request(method, url, *args, **kwargs):
+        with limiter.semaphore(url):
+            return request(method, url, *args, **kwargs)
+
+    session.request = limited_request
+
+
+class ResponseCache:
+    """LRU cache of GET responses that is revalidated with ETag / Last-Modified
+
+    GitHub answers a conditional request for an unchanged resource with a 304, which
+    doesn't count against the rate limit; the cached body is then replayed to the
+    caller as if it were a fresh 200. Entries are evicted least recently used first
+    once the cached bodies exceed `max_bytes`, and the cache is persisted to `path`
+    between runs; `save` only writes it if a response was cached since the last save.
+    """
+
+    def __init__(self, path=None, max_bytes=50 * 2 ** 20):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self._loaded = path is None
+        self._dirty = False
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _load(self):
+        """Read the on-disk store; called lazily so short-lived clients don't pay for it"""
+        self._loaded = True
+        try:
+            with open(self.path, "rb") as fi:
+                entries = pickle.load(fi)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            return
+        for key, entry in entries.items():
+            self._put(key, entry)
+
+    def save(self):
+        """Atomically write the cache to `path`, if it changed since it was last saved"""
+        if self.path is None:
+            return
+        with self._lock:
+            if not self._loaded or not self._dirty:
+                return
+            entries = OrderedDict(self._entries)
+            self._dirty = False
+        tmp_path = f"{self.path}.tmp"
+        try:
+            with open(tmp_path, "wb") as fo:
+                pickle.dump(entries, fo, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, self.path)
+        except BaseException:
+            with self._lock:
+                self._dirty = True
+            raise
+
+    def _put(self, key, entry):
+        if key in self._entries:
+            self._size -= len(self._entries.pop(key)["body"])
+        self._entries[key] = entry
+        self._size += len(entry["body"])
+        while self._size > self.max_bytes and self._entries:
+            _, evicted = self._entries.popitem(last=False)
+            self._size -= len(evicted["body"])
+
+    def get(self, key):
+        with self._lock:
+            if not self._loaded:
+                self._load()
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def put(self, key, entry):
+        with self._lock:
+            self._put(key, entry)
+            self._dirty = True
+
+    def _count(self, hit):
+        # responses are cached from several worker threads at once
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def install(self, session):
+        """Wrap `session.request` so GETs are sent conditionally and 304s replayed"""
+        request = session.request
+
+        def cached_request(method, url, *args, **kwargs):
+            headers = kwargs.get("headers") or {}
+            if method.upper() != "GET" or any(
+                header.lower() in ("if-none-match", "if-modified-since")
+                for header in headers
+            ):
+                return request(method, url, *args, **kwargs)
+            full_url = requests.Request("GET", url, params=kwargs.get("params")).prepare().url
+            key = (full_url, headers.get("Accept"))
+            entry = self.get(key)
+            if entry is not None:
+                headers = dict(headers)
+                if entry["etag"]:
+                    headers["If-None-Match"] = entry["etag"]
+                if entry["last_modified"]:
+                    headers["If-Modified-Since"] = entry["last_modified"]
+                kwargs["headers"] = headers
+            response = request(method, url, *args, **kwargs)
+            if response.status_code == 304 and entry is not None:
+                self._count(hit=True)
+                return self._replay(entry, response)
+            self._count(hit=False)
+            etag = response.headers.get("ETag")
+            last_modified = response.headers.get("Last-Modified")
+            if response.status_code == 200 and (etag or last_modified):
+                self.put(
+                    key,
+                    {
+                        "etag": etag,
+                        "last_modified": last_modified,
+                        "headers": dict(response.headers),
+                        "body": response.content,
+                    },
+                )
+            return response
+
+        session.request = cached_request
+
+    def _replay(self, entry, not_modified):
+        response = requests.Response()
+        response.status_code = 200
+        response.reason = "OK"
+        response._content = entry["body"]
+        response.headers = CaseInsensitiveDict(entry["headers"])
+        # keep the current rate limit information
+        response.headers.update(
+            {k: v for k, v in not_modified.headers.items() if k.lower().startswith("x-")}
+        )
+        response.url = not_modified.url
+        response.request = not_modified.request
+        response.encoding = requests.utils.get_encoding_from_headers(response.headers)
+        return response
+
+    def log_stats(self):
+        logging.info(
+            f"HTTP cache: {self.hits} hits, {self.misses} misses, "
+            f"{len(self._entries)} entries ({self._size} bytes)"
+        )
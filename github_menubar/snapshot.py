@@ -0,0 +1,47 @@
+"""Pre-rendered BitBar output
+
+The server renders the plugin's output whenever the state changes and writes it to
+`SNAPSHOT_PATH`, so the plugin, which BitBar runs every few seconds, can usually just
+print the file instead of connecting to the database and rendering it itself.
+"""
+import os
+import threading
+import time
+
+from github_menubar.config import CONFIG
+
+SNAPSHOT_PATH = os.path.join(CONFIG["base_dir"], "bitbar_snapshot.txt")
+
+
+def write_snapshot(text, path=SNAPSHOT_PATH):
+    """Atomically replace the snapshot at `path` with `text`"""
+    # the server renders from its scheduler and from commands, possibly at once
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "w") as fo:
+        fo.write(text)
+    os.replace(tmp_path, path)
+
+
+def remove_snapshot(path=SNAPSHOT_PATH):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def read_snapshot(max_age, path=SNAPSHOT_PATH):
+    """Contents of the snapshot, or None if it is missing or stale
+
+    A snapshot is stale once it is more than `max_age` seconds old, or older than
+    the config file, whose settings it was rendered with.
+    """
+    try:
+        rendered_at = os.path.getmtime(path)
+        if time.time() - rendered_at > max_age or rendered_at < os.path.getmtime(
+            CONFIG["config_file_path"]
+        ):
+            return None
+        with open(path) as fi:
+            return fi.read()
+    except OSError:
+        return None
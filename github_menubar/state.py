@@ -0,0 +1,184 @@
+"""Reading the GMB state
+
+`StateReader` holds the queries shared by the server's `GitHubClient` and by
+`StateClient`, the read-only client renderers use. Renderers then query the state
+through a `StateView`.
+"""
+from ZEO.ClientStorage import ClientStorage
+from ZODB import DB
+from zc.lockfile import LockError
+
+from github_menubar.compaction import reading
+from github_menubar.config import CONFIG
+from github_menubar.storage import materialize
+from github_menubar.utils import load_config
+
+CACHE_NAME = "reader"
+
+
+class StateReader:
+    """Reads the GMB state from `self.db`, filtered according to `self.CONFIG`"""
+
+    def get_state(self, complete=False):
+        """Get a dictionary specifying the current database state
+
+        By default, excludes the following:
+         - muted PRs and associated notifications
+         - cleared notifications
+         - PRs and associated notifications to be excluded based on the `mentions_only`
+           and/or `team_mentions` flags
+        If `complete` is True, this will return all notifications/PRs.
+
+        Args:
+            complete: If True, return all data, ignoring the `mentions_only and
+                `team_mentions` flags
+        Returns:
+            A dictionary of the complete database state, with the following keys:
+            {
+                "notifications":
+                "pull_requests":
+                "codeowners":
+                "team_members":
+                "last_update":
+                "schedule":
+                "mentioned":
+                "team_mentioned":
+                "muted_prs":
+            }
+            "muted_prs" lists every muted PR, read in the same transaction as the
+            rest, so renderers can list them even though they are excluded above.
+
+        """
+        mentions_only = False if complete else self.CONFIG["mentions_only"]
+        with reading(), self.db.transaction() as conn:
+            pull_requests = materialize(conn.root.pull_requests)
+            notifications = materialize(conn.root.notifications)
+            muted_prs = [pr for pr in pull_requests.values() if pr["muted"]]
+            if mentions_only:
+                pull_requests = {
+                    pr_id: pr
+                    for pr_id, pr in pull_requests.items()
+                    if (pr_id in conn.root.mentioned)
+                    or (pr["author"] == self.CONFIG["user"])
+                    or (
+                        self.CONFIG["team_mentions"]
+                        and pr_id in conn.root.team_mentioned
+                    )
+                }
+                notifications = {
+                    notif_id: notif
+                    for notif_id, notif in notifications.items()
+                    if notif.get("pr_id") in conn.root.mentioned
+                    or pull_requests.get(notif.get("pr_id"), {}).get("author")
+                    == self.CONFIG["user"]
+                }
+            if not complete:
+                pull_requests = {
+                    pr_id: pr for pr_id, pr in pull_requests.items() if not pr["muted"]
+                }
+                notifications = {
+                    notif_id: notif
+                    for notif_id, notif in notifications.items()
+                    if not pull_requests.get(notif.get("pr_id"), {}).get("muted")
+                    and not notif["cleared"]
+                }
+
+            return {
+                "notifications": notifications,
+                "pull_requests": pull_requests,
+                "codeowners": materialize(conn.root.codeowners),
+                "team_members": materialize(conn.root.team_members),
+                "last_update": conn.root.last_update,
+                # when the next update will run, and the rate limits it was planned with
+                "schedule": getattr(conn.root, "schedule", None),
+                "mentioned": materialize(conn.root.mentioned),
+                "team_mentioned": materialize(conn.root.team_mentioned),
+                "muted_prs": muted_prs,
+            }
+
+
+class StateClient(StateReader):
+    """Read-only client for renderers and queries
+
+    Unlike `GitHubClient`, it never logs in to GitHub, and opens the database
+    read-only, so it never writes to it. Objects read are kept in a persistent client
+    cache in `base_dir`: connecting checks the cache against the server in one round
+    trip, and reading the state then only loads the records that changed since the
+    last client read it. If another `StateClient` has the cache open, this one falls
+    back to an in-memory cache.
+    """
+
+    def __init__(self):
+        self.CONFIG = load_config()
+        try:
+            self.storage = ClientStorage(
+                self.CONFIG["port"],
+                read_only=True,
+                client=CACHE_NAME,
+                var=CONFIG["base_dir"],
+                # a stale cache is brought up to date rather than thrown away
+                drop_cache_rather_verify=False,
+            )
+        except LockError:
+            self.storage = ClientStorage(self.CONFIG["port"], read_only=True)
+        self.db = DB(self.storage)
+
+    def close(self):
+        self.db.close()
+
+
+class StateView:
+    """The state returned by `get_state`, indexed for rendering
+
+    The indexes are built in one pass over the PRs and one over the notifications,
+    so rendering doesn't rescan the PRs for every notification. The state's own
+    keys can still be read with `view["notifications"]` etc.
+
+    Attributes:
+        pr_by_url: PRs by API URL
+        user_prs: open PRs authored by `user`
+        involved_prs: open PRs authored by anyone else
+        notification_prs: (notification id, notification, PR) for each notification
+            that refers to one of the PRs
+        header: the counts summarized in the menu bar header
+    """
+
+    def __init__(self, state, user):
+        self.state = state
+        self.pull_requests = state["pull_requests"]
+        self.notifications = state["notifications"]
+        self.pr_by_url = {}
+        self.user_prs = []
+        self.involved_prs = []
+        header = dict.fromkeys(
+            ("n_open_prs", "n_failing_tests", "n_merge_conflicts", "n_ready"), 0
+        )
+        for pr in self.pull_requests.values():
+            self.pr_by_url[pr["url"]] = pr
+            is_open = pr["state"] not in ("CLOSED", "MERGED")
+            if pr["author"] != user:
+                if is_open:
+                    self.involved_prs.append(pr)
+                continue
+            if is_open:
+                self.user_prs.append(pr)
+            header["n_open_prs"] += 1
+            if pr["test_status"] and pr["test_status"].get("outcome") == "failure":
+                header["n_failing_tests"] += 1
+            if pr["mergeable_state"] == "dirty":
+                header["n_merge_conflicts"] += 1
+            if pr["mergeable_state"] in ("clean", "unstable"):
+                header["n_ready"] += 1
+        self.notification_prs = [
+            (notif_id, notification, self.pr_by_url[notification["url"]])
+            for notif_id, notification in self.notifications.items()
+            if notification["url"] in self.pr_by_url
+        ]
+        header["n_notifications"] = len(self.notification_prs)
+        self.header = header
+
+    def __getitem__(self, key):
+        return self.state[key]
+
+    def get(self, key, default=None):
+        return self.state.get(key, default)
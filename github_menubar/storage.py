@@ -0,0 +1,192 @@
+"""Database layout and helpers for the GMB ZODB database
+
+Collections are kept in `OOBTree`s (and sets in `OOTreeSet`s) on the root. Pull
+requests and notifications are stored as one `PersistentMapping` per record, so
+changing a record, e.g. muting a PR, only writes that record instead of re-pickling
+the whole collection.
+"""
+from BTrees.OOBTree import OOBTree, OOTreeSet
+from ZODB.POSException import ConflictError
+from ZODB.PersistentMapping import PersistentMapping
+
+_DELETED = object()
+
+COLLECTIONS = (
+    "pull_requests",
+    "notifications",
+    "codeowners",
+    "team_members",
+    "team_refreshed",
+)
+RECORD_COLLECTIONS = ("pull_requests", "notifications")
+# sets of PR ids, which only hold PRs that are in `pull_requests`
+SETS = ("mentioned", "team_mentioned")
+# fields of a record set by the user from the menu, not by updates
+USER_FIELDS = {"pull_requests": ("muted",), "notifications": ("cleared",)}
+
+
+def init_root(root):
+    """Create any missing collections, converting the plain dicts and sets earlier
+    versions stored on the root
+
+    Also prunes ids of PRs that are no longer stored from the sets, which earlier
+    versions never removed. Returns True if anything was created, converted or
+    pruned.
+    """
+    changed = False
+    for name in COLLECTIONS + SETS:
+        old = getattr(root, name, None)
+        if isinstance(old, (OOBTree, OOTreeSet)):
+            continue
+        if name in SETS:
+            new = OOTreeSet(old or ())
+        else:
+            new = OOBTree()
+            for key, value in (old or {}).items():
+                new[key] = PersistentMapping(value) if name in RECORD_COLLECTIONS else value
+        setattr(root, name, new)
+        changed = True
+    for name in SETS:
+        collection = getattr(root, name)
+        stale = [id_ for id_ in collection if id_ not in root.pull_requests]
+        for id_ in stale:
+            collection.remove(id_)
+        changed = changed or bool(stale)
+    for name in ("last_update", "schedule"):
+        if not hasattr(root, name):
+            setattr(root, name, None)
+            changed = True
+    return changed
+
+
+def materialize(value):
+    """Plain dict / set copy of a stored collection or record, which stays usable
+    after its connection is closed"""
+    if isinstance(value, OOTreeSet):
+        return set(value)
+    if isinstance(value, (OOBTree, PersistentMapping)):
+        return {key: materialize(item) for key, item in value.items()}
+    return value
+
+
+class StagedChanges:
+    """Changes recorded for a `UnitOfWork`, and staged in it later by `stage`
+
+    Lets work done in another thread prepare changes without writing to the unit of
+    work, which is only used from one thread.
+    """
+
+    def __init__(self):
+        self._calls = []
+
+    def put(self, name, key, value):
+        self._calls.append(("put", (name, key, value)))
+
+    def delete(self, name, key):
+        self._calls.append(("delete", (name, key)))
+
+    def add(self, name, *members):
+        self._calls.append(("add", (name, *members)))
+
+    def stage(self, uow):
+        """Stage the recorded changes in `uow`, in the order they were made"""
+        for method, args in self._calls:
+            getattr(uow, method)(*args)
+        self._calls = []
+
+
+class UnitOfWork:
+    """Staged changes to the GMB database
+
+    Reads the root collections once, when it is created. Reads and writes during
+    the unit of work go to in-memory working copies, and `commit` writes all changes
+    made since the previous commit in a single transaction, so other clients only
+    ever see the database before or after a complete batch of changes. The
+    `USER_FIELDS` of records already stored are kept as they are in the database,
+    so a PR muted or a notification cleared during the unit of work stays so.
+    """
+
+    def __init__(self, db):
+        self.db = db
+        self.commits = 0
+        self._data = {}
+        with db.transaction() as conn:
+            for name in COLLECTIONS + SETS:
+                self._data[name] = materialize(getattr(conn.root, name))
+        self._changes = {name: {} for name in COLLECTIONS + SETS}
+        self._attributes = {}
+
+    def __getitem__(self, name):
+        return self._data[name]
+
+    def put(self, name, key, value):
+        self._data[name][key] = value
+        self._changes[name][key] = value
+
+    def delete(self, name, key):
+        self._data[name].pop(key, None)
+        self._changes[name][key] = _DELETED
+
+    def add(self, name, *members):
+        """Add `members` to one of the sets"""
+        for member in members:
+            self._data[name].add(member)
+            self._changes[name][member] = member
+
+    def discard(self, name, *members):
+        """Remove `members` from one of the sets, if they are in it"""
+        for member in members:
+            if member in self._data[name]:
+                self._data[name].discard(member)
+                self._changes[name][member] = _DELETED
+
+    def set(self, name, value):
+        """Set a single value on the database root"""
+        self._attributes[name] = value
+
+    def commit(self, attempts=3):
+        """Write all staged changes in one transaction; does nothing if there are none
+
+        Records that are unchanged aren't written at all. The transaction is retried
+        if it conflicts with a concurrent write, e.g. a PR being muted, and then reads
+        the muted flag again.
+        """
+        if not self._attributes and not any(self._changes.values()):
+            return
+        for attempt in range(attempts):
+            try:
+                with self.db.transaction() as conn:
+                    self._apply(conn.root)
+                break
+            except ConflictError:
+                if attempt == attempts - 1:
+                    raise
+        self._changes = {name: {} for name in self._changes}
+        self._attributes = {}
+        self.commits += 1
+
+    def _apply(self, root):
+        for name, changes in self._changes.items():
+            collection = getattr(root, name)
+            for key, value in changes.items():
+                if name in SETS and value is _DELETED:
+                    if key in collection:
+                        collection.remove(key)
+                elif name in SETS:
+                    collection.add(key)
+                elif value is _DELETED:
+                    collection.pop(key, None)
+                elif name not in RECORD_COLLECTIONS:
+                    collection[key] = value
+                elif key not in collection:
+                    collection[key] = PersistentMapping(value)
+                else:
+                    record = collection[key]
+                    for field in USER_FIELDS[name]:
+                        if field in record:
+                            value = dict(value, **{field: record[field]})
+                    if materialize(record) != value:
+                        record.clear()
+                        record.update(value)
+        for name, value in self._attributes.items():
+            setattr(root, name, value)
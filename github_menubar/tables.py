@@ -0,0 +1,86 @@
+"""Plain text tables for the menu
+
+`format_table` lays out the menu's tables exactly as
+`tabulate(rows, headers, tablefmt="plain")` does, but only handles what the menu
+puts in them: rows of single-line text. Column widths are found in one pass over
+the cells, without tabulate's per-cell type inference. Tables it doesn't handle,
+e.g. with a column of numbers, which tabulate aligns differently, are passed on to
+tabulate.
+"""
+import re
+
+try:
+    from wcwidth import wcswidth
+except ImportError:
+    wcswidth = None
+
+# the padding tabulate adds to header widths
+MIN_PADDING = 2
+SEPARATOR = "  "
+BOOLEANS = ("True", "False")
+_CONTROL = re.compile("[\x00-\x1f\x7f]")
+
+
+def _width(text):
+    """Display width of `text`, measured as tabulate measures it"""
+    return len(text) if wcswidth is None else wcswidth(text)
+
+
+def _is_number(cell):
+    try:
+        float(cell)
+    except ValueError:
+        return False
+    return True
+
+
+def _is_text(column):
+    """Whether tabulate would treat `column` as text, rather than numbers
+
+    Like tabulate, ignores empty cells, which it treats as missing values.
+    """
+    return not all(not cell or cell in BOOLEANS or _is_number(cell) for cell in column)
+
+
+def _tabulate(rows, headers):
+    # only imported for the tables that need it
+    from tabulate import tabulate
+
+    return tabulate(rows, headers=headers, tablefmt="plain").split("\n")
+
+
+def format_table(rows, headers=()):
+    """The lines of `tabulate(rows, headers, tablefmt="plain")`"""
+    headers = list(headers)
+    columns = list(zip(*rows))
+    if (
+        not rows
+        or any(len(row) != len(columns) for row in rows)
+        or (headers and len(headers) != len(columns))
+        or not all(isinstance(cell, str) for column in columns for cell in column)
+        # control characters cover line breaks, ANSI codes and separating lines
+        or any(_CONTROL.search(cell) for column in columns for cell in column)
+        or any(_CONTROL.search(header) for header in headers)
+        or not all(_is_text(column) for column in columns)
+    ):
+        return _tabulate(rows, headers)
+    padded_columns = []
+    padded_headers = []
+    for i, column in enumerate(columns):
+        cells = [cell.strip() for cell in column]
+        widths = [_width(cell) for cell in cells]
+        header_width = _width(headers[i]) if headers else 0
+        if min(widths) < 0 or header_width < 0:
+            # unprintable characters
+            return _tabulate(rows, headers)
+        width = max(widths)
+        if headers:
+            width = max(width, header_width + MIN_PADDING)
+            padded_headers.append(headers[i] + " " * (width - header_width))
+        padded_columns.append(
+            [cell + " " * (width - w) for cell, w in zip(cells, widths)]
+        )
+    lines = [SEPARATOR.join(row).rstrip() for row in zip(*padded_columns)]
+    if headers:
+        lines.insert(0, SEPARATOR.join(padded_headers).rstrip())
+    return lines
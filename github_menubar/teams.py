@@ -0,0 +1,32 @@
+class TeamIndex:
+    """Members of every known team, indexed both ways
+
+    Teams are keyed by "org/team-name", the form CODEOWNERS and team searches use.
+    `teams(user)` and `is_member(user, team)` are dict lookups, so checking whether a
+    user is on a team never scans a member list, and single teams can be replaced in
+    place as they are refreshed.
+    """
+
+    def __init__(self):
+        self._members = {}
+        self._teams = {}
+
+    def update(self, team, members):
+        """Replace the members of `team`"""
+        self.remove(team)
+        self._members[team] = frozenset(members)
+        for user in self._members[team]:
+            self._teams.setdefault(user, set()).add(team)
+
+    def remove(self, team):
+        for user in self._members.pop(team, ()):
+            self._teams[user].discard(team)
+            if not self._teams[user]:
+                del self._teams[user]
+
+    def teams(self, user):
+        return frozenset(self._teams.get(user, ()))
+
+    def is_member(self, user, team):
+        return team in self._teams.get(user, ())
+
@@ -1,5 +1,4 @@
 import os
-import plistlib
 
 from github_menubar.config import CONFIG, DEFAULT_CONFIG, PLIST_CONFIG
 
@@ -17,7 +16,11 @@ class InvaldConfigKey(Exception):
 def load_config():
     try:
         yaml = ruamel.yaml.YAML()
-        return yaml.load(open(CONFIG["config_file_path"]).read())
+        config = yaml.load(open(CONFIG["config_file_path"]).read())
+        # fill in any options added since the config file was written
+        for key, value in ruamel.yaml.YAML(typ="safe").load(DEFAULT_CONFIG).items():
+            config.setdefault(key, value)
+        return config
     except FileNotFoundError:
         raise
     except Exception:
@@ -55,6 +58,8 @@ def upgrade_config():
 
 
 def configure_plist():
+    import plistlib
+
     config = load_config()
     plist_config = PLIST_CONFIG
     plist_config["Disabled"] = not config["launch_on_startup"]
@@ -9,6 +9,7 @@ setup(
     author_email="jlorince@narrativescience.com",
     license="MIT",
     packages=["github_menubar"],
+    python_requires=">=3.9",
     install_requires=[
         "arrow",
         "github3.py",
@@ -20,6 +21,6 @@ setup(
         "ZEO",
         "ZODB"
     ],
-    entry_points={"console_scripts": ["gmb=github_menubar.github_client:main"]},
+    entry_points={"console_scripts": ["gmb=github_menubar.cli:main"]},
     zip_safe=False,
 )